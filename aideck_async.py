@@ -0,0 +1,234 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+
+import aideck_stream as aideck
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFrameReceiver:
+    """
+    class for receiving images from the AI deck on an asyncio event loop without per-frame allocations
+
+    Like aideck_stream.FrameReceiver, the packets are read with sock_recv_into() directly into a
+    preallocated ring of frame slots, see aideck_stream.FrameRing for how long a returned frame stays valid.
+    """
+
+    def __init__(self, sock, ring):
+        """
+        constructor for an asyncio frame receiver
+        :param sock: connected non-blocking socket to the AI deck
+        :param ring: aideck_stream.FrameRing, the images are stored in its slots
+        """
+        self.sock = sock
+        self.ring = ring
+
+        # buffers for the packet info and the image header, reused for every packet
+        self._info = bytearray(aideck.PACKET_INFO.size)
+        self._info_view = memoryview(self._info)
+        self._header = bytearray(2 ** 16)
+        self._header_view = memoryview(self._header)
+
+    async def _rx_into(self, view):
+        """
+        fills a memoryview with data from the AI deck
+        :param view: memoryview that is filled completely
+        :return: -
+        """
+        loop = asyncio.get_running_loop()
+        received = 0
+        size = len(view)
+        while received < size:
+            n = await loop.sock_recv_into(self.sock, view[received:])
+            if n == 0:
+                raise ConnectionError("AI deck closed the connection")
+            received += n
+
+    async def _rx_packet_info(self):
+        """
+        receives the packet info of the next packet
+        :return: int: length
+                 length of the packet (including routing and function byte)
+        """
+        await self._rx_into(self._info_view)
+        length, _, _ = aideck.PACKET_INFO.unpack(self._info)
+        return length
+
+    async def receive_frame(self):
+        """
+        receives the next image from the AI deck
+        :return: ndarray: frame,
+                 tuple: header
+                 the image data (2D view for RAW images, 1D encoded bytes for JPEG images)
+                 and the image header (width, height, depth, image_format, size)
+        """
+        header = None
+        while header is None:
+            length = await self._rx_packet_info()
+            header_view = self._header_view[:length - 2]
+            await self._rx_into(header_view)
+            # skip packets that are not an image header (e.g., a chunk of an interrupted image)
+            header = aideck.parse_image_header(header_view)
+
+        size = header[4]
+        frame, view = self.ring.next_slot(size)
+
+        # receive the image, it is split up in packets of some size
+        received = 0
+        while received < size:
+            length = await self._rx_packet_info()
+            if received + length - 2 > self.ring.slot_size:
+                raise ValueError("image chunk exceeds the announced image size")
+            await self._rx_into(view[received:received + length - 2])
+            received += length - 2
+
+        return aideck.frame_from_slot(frame, header), header
+
+
+async def read_frame(receiver, timeout):
+    """
+    reads the next image with a single deadline for the whole frame
+    :param receiver: AsyncFrameReceiver connected to the AI deck
+    :param timeout: maximum time in seconds to receive the frame
+    :return: ndarray: frame,
+             tuple: header
+             see AsyncFrameReceiver.receive_frame()
+    """
+    return await asyncio.wait_for(receiver.receive_frame(), timeout)
+
+
+class AsyncStreamClient:
+    """
+    class for receiving the image stream of the AI deck with asyncio
+
+    The client runs its own event loop on a background thread and publishes every decoded
+    image into a frame mailbox. If the connection is lost or no data arrives within the timeout,
+    the client reconnects automatically; the control loop keeps running on the last image
+    and simply sees no new frames in the mailbox until the stream is back. Unexpected errors
+    (e.g., while decoding or recording a frame) are logged and also lead to a reconnect.
+    """
+
+    def __init__(self, ip, port, mailbox, timeout=2.0, reconnect_delay=0.5, slots=4, recorder=None,
+                 decoder='gray'):
+        """
+        constructor for an asyncio streaming client
+        :param ip: IP address of the AI deck
+        :param port: port of the AI deck
+        :param mailbox: aideck_stream.FrameMailbox, receives the decoded images
+        :param timeout: maximum time in seconds for connecting and for receiving a frame
+        :param reconnect_delay: time in seconds to wait before reconnecting
+        :param slots: number of frame slots of the receive ring
+        :param recorder: optional frame_recorder.FrameRecorder, receives every streamed image
+        :param decoder: name of the decode backend, see aideck_stream.DECODERS
+        """
+        self.ip = ip
+        self.port = port
+        self.mailbox = mailbox
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.recorder = recorder
+        self.decoder = decoder
+        self.ring = aideck.FrameRing(slots)
+        self.connected = threading.Event()
+        self.reconnects = 0  # number of reconnects after a lost connection
+        self.errors = 0  # number of unexpected errors of the streaming task
+
+        self._stopping = False
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        """
+        starts the event loop thread and the streaming task
+        :return: -
+        """
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._stream())
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def wait_connected(self, timeout=None):
+        """
+        blocks until the client is connected to the AI deck
+        :param timeout: maximum time in seconds to wait
+        :return: boolean: connected
+                 True if the client is connected
+        """
+        return self.connected.wait(timeout)
+
+    def stop(self, timeout=2.0):
+        """
+        cancels the streaming task and stops the event loop thread, returns in bounded time
+        :param timeout: maximum time in seconds to wait for the thread
+        :return: boolean: stopped
+                 True if the thread has terminated
+        """
+        if self._thread is None:
+            return True
+        # the flag also ends the task if a cancellation is lost, e.g., in asyncio.wait_for()
+        self._stopping = True
+        if self._thread.is_alive() and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass  # the loop was closed in the meantime, the thread has ended
+        self._thread.join(timeout)
+        stopped = not self._thread.is_alive()
+        self._thread = None
+        return stopped
+
+    def _run_loop(self):
+        """
+        thread function, runs the event loop until the streaming task ends
+        :return: -
+        """
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _stream(self):
+        """
+        streaming task, (re)connects to the AI deck and receives images until cancelled
+        :return: -
+        """
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (self.ip, self.port)), self.timeout)
+                receiver = AsyncFrameReceiver(sock, self.ring)
+                self.connected.set()
+                while not self._stopping:
+                    frame, header = await read_frame(receiver, self.timeout)
+                    image_format = header[3]
+                    self.mailbox.publish(aideck.decode_frame(frame, image_format, self.decoder))
+                    if self.recorder is not None:
+                        self.recorder.record(frame, image_format)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                # connection lost or stream stalled --> reconnect
+                self.reconnects += 1
+            except Exception:
+                # keep the stream alive, but do not hide the error
+                self.errors += 1
+                self.reconnects += 1
+                logger.exception("Unexpected error in the AI deck image stream")
+            finally:
+                self.connected.clear()
+                sock.close()
+            if not self._stopping:
+                await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,203 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import argparse
+import random
+import socket
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+import aideck_stream as aideck
+
+# root directory of repo for relative path specification
+ROOT = Path(__file__).parent.absolute()
+
+# largest payload of a packet, the packet length (payload + routing and function byte) is an unsigned short
+MAX_CHUNK_SIZE = 2 ** 16 - 1 - 2
+
+
+def load_frames(path, image_format):
+    """
+    loads the frames that are replayed by the simulator
+    :param path: directory with .png/.jpeg/.jpg images (sorted by name) or a single image
+    :param image_format: format in which the frames are streamed (RAW_ENCODING or JPEG_ENCODING)
+    :return: list: frames
+             list of (width, height, payload) for every image
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(f for f in path.iterdir() if f.suffix.lower() in ('.png', '.jpeg', '.jpg'))
+    else:
+        files = [path]
+
+    frames = []
+    for fn in files:
+        img = cv2.imread(str(fn), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        height, width = img.shape
+        if image_format == aideck.RAW_ENCODING:
+            payload = img.tobytes()
+        elif fn.suffix.lower() in ('.jpeg', '.jpg'):
+            # recorded JPEG images are streamed as they are
+            payload = fn.read_bytes()
+        else:
+            payload = cv2.imencode('.jpeg', img)[1].tobytes()
+        frames.append((width, height, payload))
+    return frames
+
+
+def encode_frame(width, height, payload, image_format, chunk_size):
+    """
+    encodes an image in the CPX framing of the wifi-img-streamer
+    :param width: width of the image
+    :param height: height of the image
+    :param payload: RAW pixels or JPEG encoded image
+    :param image_format: format of the image
+    :param chunk_size: maximum payload size of a packet (1 ... MAX_CHUNK_SIZE)
+    :return: list: packets
+             image header packet followed by the chunk packets
+    """
+    header = aideck.IMAGE_HEADER.pack(aideck.IMAGE_MAGIC, width, height, 1, image_format, len(payload))
+    packets = [aideck.PACKET_INFO.pack(len(header) + 2, 0, 0) + header]
+    for i in range(0, len(payload), chunk_size):
+        chunk = payload[i:i + chunk_size]
+        packets.append(aideck.PACKET_INFO.pack(len(chunk) + 2, 0, 0) + chunk)
+    return packets
+
+
+class StreamSimulator:
+    """
+    class for a local TCP server that streams images like the AI deck
+
+    The server replays a list of images at a configurable frame rate. Jitter delays every frame
+    by a random time, loss drops whole frames with the given probability.
+    """
+
+    def __init__(self, frames, image_format=aideck.RAW_ENCODING, ip="127.0.0.1", port=5000, fps=30,
+                 chunk_size=1024, jitter=0.0, loss=0.0, seed=None):
+        """
+        constructor for a stream simulator
+        :param frames: list of (width, height, payload), see load_frames()
+        :param image_format: format of the streamed images
+        :param ip: IP address to listen on
+        :param port: port to listen on (0 --> any free port)
+        :param fps: frames per second, 0 streams as fast as possible
+        :param chunk_size: maximum payload size of a packet (1 ... MAX_CHUNK_SIZE)
+        :param jitter: maximum additional random delay of a frame in seconds
+        :param loss: probability that a frame is dropped
+        :param seed: seed for the random generator (for reproducible runs)
+        """
+        if not frames:
+            raise ValueError("no frames to stream")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("chunk_size must be between 1 and " + str(MAX_CHUNK_SIZE))
+
+        self.image_format = image_format
+        self.fps = fps
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.sent = 0  # number of sent frames
+        self.dropped = 0  # number of dropped frames
+
+        # encode all frames once, so streaming only costs socket writes
+        self.packets = [b"".join(encode_frame(w, h, p, image_format, chunk_size)) for w, h, p in frames]
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((ip, port))
+        self._server.listen(1)
+        self.address = self._server.getsockname()
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        starts the server thread
+        :return: -
+        """
+        self._thread = threading.Thread(target=self.serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        stops the server
+        :return: -
+        """
+        self._stop.set()
+        self._server.close()
+        if self._thread is not None:
+            self._thread.join(2)
+
+    def serve(self):
+        """
+        accepts clients and streams the frames to them, one client at a time
+        :return: -
+        """
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    self._stream(conn)
+                except OSError:
+                    # client disconnected --> wait for next client
+                    pass
+
+    def _stream(self, conn):
+        """
+        streams the frames to a client in a loop until the server is stopped
+        :param conn: socket of the client
+        :return: -
+        """
+        period = 1 / self.fps if self.fps > 0 else 0
+        next_time = time.time()
+        index = 0
+        while not self._stop.is_set():
+            next_time += period
+            delay = next_time - time.time() + self.random.uniform(0, self.jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            if self.random.random() < self.loss:
+                self.dropped += 1
+            else:
+                conn.sendall(self.packets[index])
+                self.sent += 1
+            index = (index + 1) % len(self.packets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Simulate the image stream of the AI-deck')
+    parser.add_argument("-n", default="127.0.0.1", metavar="ip", help="IP to listen on")
+    parser.add_argument("-p", type=int, default='5000', metavar="port", help="port to listen on")
+    parser.add_argument("--images", default=str(ROOT.joinpath("calibrate_camera", "images")),
+                        help="directory with images (or recorded images) to replay")
+    parser.add_argument("--jpeg", action='store_true', help="stream JPEG encoded images instead of RAW images")
+    parser.add_argument("--fps", type=float, default=30, help="frames per second (0 --> as fast as possible)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="payload size of a packet in bytes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random delay of a frame in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability that a frame is dropped")
+    parser.add_argument("--seed", type=int, default=None, help="seed for jitter and loss")
+    args = parser.parse_args()
+    if not 0 < args.chunk_size <= MAX_CHUNK_SIZE:
+        parser.error("--chunk-size must be between 1 and " + str(MAX_CHUNK_SIZE))
+
+    img_format = aideck.JPEG_ENCODING if args.jpeg else aideck.RAW_ENCODING
+    simulator = StreamSimulator(load_frames(args.images, img_format), img_format, args.n, args.p, args.fps,
+                                args.chunk_size, args.jitter, args.loss, args.seed)
+    print("Streaming {} images on {}:{}...".format(len(simulator.packets), *simulator.address))
+    try:
+        simulator.serve()
+    except KeyboardInterrupt:
+        print("Sent {} frames, dropped {} frames".format(simulator.sent, simulator.dropped))
@@ -0,0 +1,323 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+import cv2
+
+# CPX packet info that precedes every packet: length, routing, function
+PACKET_INFO = struct.Struct('<HBB')
+
+# image header sent by the wifi-img-streamer: magic, width, height, depth, format, size
+IMAGE_HEADER = struct.Struct('<BHHBBI')
+
+# magic byte that marks an image header
+IMAGE_MAGIC = 0xBC
+
+# image formats of the wifi-img-streamer
+RAW_ENCODING = 0
+JPEG_ENCODING = 1
+
+
+class FrameRing:
+    """
+    class for a preallocated ring of frame slots
+
+    A frame slot is reused after 'slots' frames, i.e. a frame stays valid for the next
+    'slots - 1' received frames. Copy the frame if it must be kept longer.
+    """
+
+    def __init__(self, slots=4, slot_size=324 * 244):
+        """
+        constructor for a ring of frame slots
+        :param slots: number of frame slots in the ring
+        :param slot_size: initial size of a frame slot in bytes, slots grow if a larger image is announced
+        """
+        self.slots = slots
+        self.index = 0
+        self._allocate(slot_size)
+
+    def _allocate(self, slot_size):
+        """
+        allocates the frame slots
+        :param slot_size: size of a frame slot in bytes
+        :return: -
+        """
+        self.slot_size = slot_size
+        self._frames = [np.empty(slot_size, dtype=np.uint8) for _ in range(self.slots)]
+        self._views = [memoryview(frame) for frame in self._frames]
+
+    def next_slot(self, size):
+        """
+        returns the next frame slot of the ring
+        :param size: size of the image that is received into the slot
+        :return: ndarray: frame,
+                 memoryview: view
+                 the slot as array and as memoryview (both share the same memory)
+        """
+        if size > self.slot_size:
+            self._allocate(size)
+        frame = self._frames[self.index]
+        view = self._views[self.index]
+        self.index = (self.index + 1) % self.slots
+        return frame, view
+
+
+def frame_from_slot(frame, header):
+    """
+    returns the received image as a view into its frame slot
+    :param frame: frame slot the image was received into
+    :param header: image header (width, height, depth, image_format, size)
+    :return: ndarray: frame
+             2D view for RAW images, 1D view of the encoded bytes for JPEG images
+    """
+    width, height, _, image_format, size = header
+    if image_format == RAW_ENCODING:
+        return frame[:size].reshape((height, width))
+    return frame[:size]
+
+
+def parse_image_header(data):
+    """
+    parses an image header packet
+    :param data: payload of the packet (without packet info)
+    :return: tuple: header
+             image header (width, height, depth, image_format, size),
+             None if the packet is not an image header
+    """
+    if len(data) != IMAGE_HEADER.size or data[0] != IMAGE_MAGIC:
+        return None
+    return IMAGE_HEADER.unpack_from(data)[1:]
+
+
+class FrameReceiver:
+    """
+    class for receiving images from the AI deck without per-frame allocations
+
+    The packets are read with recv_into() directly into a preallocated ring of frame slots,
+    see FrameRing for how long a returned frame stays valid.
+    """
+
+    def __init__(self, sock, slots=4, slot_size=324 * 244):
+        """
+        constructor for a frame receiver
+        :param sock: connected socket to the AI deck
+        :param slots: number of frame slots in the ring
+        :param slot_size: initial size of a frame slot in bytes, slots grow if a larger image is announced
+        """
+        self.sock = sock
+        self.ring = FrameRing(slots, slot_size)
+
+        # buffers for the packet info and the image header, reused for every packet
+        self._info = bytearray(PACKET_INFO.size)
+        self._info_view = memoryview(self._info)
+        self._header = bytearray(2 ** 16)
+        self._header_view = memoryview(self._header)
+
+    def _rx_into(self, view):
+        """
+        fills a memoryview with data from the AI deck
+        :param view: memoryview that is filled completely
+        :return: -
+        """
+        received = 0
+        size = len(view)
+        while received < size:
+            n = self.sock.recv_into(view[received:])
+            if n == 0:
+                raise ConnectionError("AI deck closed the connection")
+            received += n
+
+    def _rx_packet_info(self):
+        """
+        receives the packet info of the next packet
+        :return: int: length
+                 length of the packet (including routing and function byte)
+        """
+        self._rx_into(self._info_view)
+        length, _, _ = PACKET_INFO.unpack(self._info)
+        return length
+
+    def receive_frame(self):
+        """
+        receives the next image from the AI deck
+        :return: ndarray: frame,
+                 tuple: header
+                 the image data (2D view for RAW images, 1D encoded bytes for JPEG images)
+                 and the image header (width, height, depth, image_format, size)
+        """
+        header = None
+        while header is None:
+            length = self._rx_packet_info()
+            header_view = self._header_view[:length - 2]
+            self._rx_into(header_view)
+            # skip packets that are not an image header (e.g., a chunk of an interrupted image)
+            header = parse_image_header(header_view)
+
+        size = header[4]
+        frame, view = self.ring.next_slot(size)
+
+        # receive the image, it is split up in packets of some size
+        received = 0
+        while received < size:
+            length = self._rx_packet_info()
+            if received + length - 2 > self.ring.slot_size:
+                raise ValueError("image chunk exceeds the announced image size")
+            self._rx_into(view[received:received + length - 2])
+            received += length - 2
+
+        return frame_from_slot(frame, header), header
+
+
+def connect(ip, port, timeout=None):
+    """
+    opens a socket to the AI deck
+    :param ip: IP address of the AI deck
+    :param port: port of the AI deck
+    :param timeout: optional socket timeout in seconds
+    :return: socket: client_socket
+             the connected socket
+    """
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.settimeout(timeout)
+    client_socket.connect((ip, port))
+    return client_socket
+
+
+def decode_gray(frame, image_format):
+    """
+    decode backend for grayscale images (default)
+    :param frame: image data as returned by the receiver
+    :param image_format: format of the image
+    :return: ndarray: img_gray
+             RAW images are returned as view into the receive buffer, JPEG images are decoded
+    """
+    if image_format == RAW_ENCODING:
+        return frame
+    return cv2.imdecode(frame, cv2.IMREAD_UNCHANGED)
+
+
+def decode_color(frame, image_format):
+    """
+    decode backend for color images
+    :param frame: image data as returned by the receiver
+    :param image_format: format of the image
+    :return: ndarray: img_color
+             RAW images are debayered to BGRA (like the saved color images), JPEG images are decoded to BGR
+    """
+    if image_format == RAW_ENCODING:
+        return cv2.cvtColor(frame, cv2.COLOR_BayerBG2BGRA)
+    return cv2.imdecode(frame, cv2.IMREAD_COLOR)
+
+
+def decode_none(frame, image_format):
+    """
+    decode backend that skips decoding, e.g., for measuring the pure streaming performance
+    :param frame: image data as returned by the receiver
+    :param image_format: format of the image
+    :return: ndarray: frame
+             the received image data
+    """
+    return frame
+
+
+# available decode backends, more can be added with register_decoder()
+DECODERS = {'gray': decode_gray,
+            'color': decode_color,
+            'none': decode_none}
+
+
+def register_decoder(name, decoder):
+    """
+    registers a decode backend
+    :param name: name of the backend
+    :param decoder: function(frame, image_format) that returns the decoded image
+    :return: -
+    """
+    DECODERS[name] = decoder
+
+
+def decode_frame(frame, image_format, backend='gray'):
+    """
+    decodes a received image with a decode backend
+    :param frame: image data as returned by the receiver
+    :param image_format: format of the image
+    :param backend: name of the decode backend, see DECODERS
+    :return: ndarray: image
+             the decoded image
+    """
+    return DECODERS[backend](frame, image_format)
+
+
+class FrameMailbox:
+    """
+    class for handing the latest frame from the acquisition thread to the control loop
+
+    Every published frame gets a sequence number (starting at 1) and a receive timestamp.
+    Consumers remember the sequence number of the last processed frame and block until a newer
+    frame arrives, so a frame is never processed twice.
+
+    The mailbox does not copy the frames. If the stream publishes views into a FrameRing (RAW
+    images), a frame is only valid until its slot is reused 'slots' frames later; consumers that
+    keep a frame longer or hand it to another thread or process (e.g., the preview) must copy it.
+    """
+
+    def __init__(self):
+        """
+        constructor for a frame mailbox
+        """
+        self._condition = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+
+    def publish(self, frame, timestamp=None):
+        """
+        publishes a new frame and wakes up waiting consumers
+        :param frame: the new frame
+        :param timestamp: receive time of the frame (time.time()), now if not given
+        :return: int: seq
+                 sequence number of the published frame
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._condition:
+            self._seq += 1
+            self._frame = frame
+            self._timestamp = timestamp
+            self._condition.notify_all()
+            return self._seq
+
+    def latest(self):
+        """
+        returns the latest frame without waiting
+        :return: ndarray: frame,
+                 int: seq,
+                 double: timestamp
+                 latest frame, its sequence number and receive timestamp (None, 0, 0.0 if no frame arrived yet)
+        """
+        with self._condition:
+            return self._frame, self._seq, self._timestamp
+
+    def wait_for_newer(self, seq, timeout=None):
+        """
+        blocks until a frame newer than 'seq' is available
+        :param seq: sequence number of the last processed frame (0 --> any frame)
+        :param timeout: maximum time in seconds to wait, None waits forever
+        :return: ndarray: frame,
+                 int: seq,
+                 double: timestamp
+                 newest frame, its sequence number and receive timestamp,
+                 (None, seq, 0.0) if no newer frame arrived before the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > seq, timeout):
+                return None, seq, 0.0
+            return self._frame, self._seq, self._timestamp
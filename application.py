@@ -9,27 +9,40 @@ import math
 import time
 import argparse
 import yaml
-import socket
-import struct
 import numpy as np
-import threading
 import datetime
 
 # import cf functions
 import cflib.crtp
 from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
-from cflib.crazyflie.syncLogger import SyncLogger
-from cflib.crazyflie.log import LogConfig
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
 
-# import open cv functions
-import cv2
-
 # import square planar marker functions
 import square_planar_marker as spm
 
+# import camera calibration
+from calibration import load_calibration
+
+# import AI deck streaming functions
+import aideck_stream as aideck
+from aideck_async import AsyncStreamClient
+from frame_recorder import FrameRecorder
+from flight_log import FlightRecorder
+
+# import telemetry functions
+from telemetry import TelemetrySubscriber, TelemetryHistory
+
+# import filter functions
+from state_estimation import ESTIMATORS, create_estimator
+import filter_analysis
+
+# import pipeline functions
+from pipeline import Pipeline, MailboxSource, marker_stages
+from camera_model import get_camera_model
+from preview import PreviewPublisher
+
 # import custom exceptions
 import custom_exceptions as exceptions
 
@@ -51,152 +64,29 @@ MAX_MARKER_ID = 2
 # define destination vector marker <--> crazyflie
 DISTANCE = np.array([0, 0, 60])  # [cm]
 
+# control mode of the approach
+# 'position' --> every pose is followed by a blocking move (1/25 of the trajectory) and turn (1/8 of the yaw angle)
+# 'velocity' --> every pose updates the velocity setpoint, the loop never waits for the motion
+#                (opt-in with --control-mode velocity, the gains below are not validated in flight yet)
+CONTROL_MODE = 'position'
 
-def get_cf_data(scf):
-    """
-    fetches logging information from the crazyflie
-    :param scf: id of SyncCrazyflie
-    :return: double: v_bat,
-             double: yaw,
-             double: pitch,
-             double: roll,
-             battery level and current yaw, pitch, roll values
-    """
-
-    # fetch parameter data from cf and extract information
-    with SyncLogger(scf, log_stabilizer) as logger:
-        # logger.connect()
-        for entry in logger:
-            log_data = entry[1]
-            vbat = log_data.get('pm.vbat')
-            yaw = log_data.get('stabilizer.yaw')
-            pitch = log_data.get('stabilizer.pitch')
-            roll = log_data.get('stabilizer.roll')
-            time.sleep(0.02)
-            return vbat, yaw, pitch, roll
-
-
-def rx_bytes(size):
-    """
-    fetches data from the AI deck over wi-fi
-    :param size: size of data segment to fetch
-    :return: bytearray: data
-             the received data in a bytearray
-    """
-
-    rx_data = bytearray()
-    while len(rx_data) < size:
-        rx_data.extend(client_socket.recv(size - len(rx_data)))
-    return rx_data
-
-
-def get_image_from_ai_deck():
-    """
-    function to fetch image from the AI deck
-    :return: -
-             saves the captured image in the global variable 'image'
-    """
-    # Get the info
-    while True:
-        global image
-        global stop_thread_flag
-        if stop_thread_flag:
-            break
-        packet_info_raw = rx_bytes(4)
-        [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, _, _, _, image_format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            if image_format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in this path
-                with open("./wifi_streaming/imgBuffer/img.jpeg", "wb") as im:
-                    im.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
-
-            # set global variable
-            image = img_gray
-
-
-class MovingAverageFilter:
-    """
-    class for moving average filter for trajectory paths
-    """
-
-    def __init__(self, wind_size):
-        """
-        constructor for a moving average lowpass filter
-        :param wind_size: size of the filter window of the moving average filter
-        """
-        self.wind_size = wind_size
-        self.data_x = []
-        self.data_y = []
-        self.data_z = []
-        self.data_psi = []
-        self.weights = []
-
-        # define weights
-        for a in range(wind_size, 0, -1):
-            self.weights.append(1 / a)
-
-    def append(self, t_vec, eul_angles):
-        """
-        function for appending the filter data
-        :param t_vec: translation vector marker
-        :param eul_angles: euler angles of the marker
-        :return: -
-        """
-        self.data_y.append(t_vec[0, 0, 0])
-        self.data_z.append(t_vec[0, 0, 1])
-        self.data_x.append(t_vec[0, 0, 2])
-        self.data_psi.append(eul_angles[1])
-
-    def get_moving_average(self):
-        """
-        function to get the moving average filtered values
-        :return:    double array[]: t_vec (filtered),
-                    double: psi_angle (filtered yaw angle)
-        """
-
-        t_vec = [0, 0, 0]
-        length = len(self.data_x)
-        t_vec[2] = np.average(self.data_x[length - self.wind_size:length])
-        t_vec[0] = np.average(self.data_y[length - self.wind_size:length])
-        t_vec[1] = np.average(self.data_z[length - self.wind_size:length])
-        psi = np.average(self.data_psi[length - self.wind_size:length])
-
-        return t_vec, psi
+# gains and limits of the velocity control mode
+VELOCITY_GAIN = 1.0  # [1/s] velocity towards the destination = gain * trajectory
+MAX_VELOCITY = 0.15  # [m/s]
+YAW_RATE_GAIN = 1.0  # [1/s] yaw rate = gain * yaw angle
+MAX_YAW_RATE = 30  # [degrees/s]
+POSE_TIMEOUT = 0.3  # [s] without a new pose of the marker, the crazyflie hovers
 
-    def get_weighted_moving_average(self):
-        """
-        function to get the weighted moving average values for linear and unweighted for angular motion
-        :return:    double array[]: t_vec (filtered),
-                    double: psi_angle (filtered yaw angle)
-        """
+# estimator for the pose of the marker (see state_estimation.py)
+# 'moving-average' --> weighted moving average, waits for a full window and lags behind
+# 'kalman' / 'alpha-beta' --> constant velocity models, ready after 2 poses and predict between images
+ESTIMATOR = 'moving-average'
 
-        t_vec = [0, 0, 0]
-        length = len(self.data_x)
-        t_vec[2] = np.average(self.data_x[length - self.wind_size:length], weights=self.weights)
-        t_vec[0] = np.average(self.data_y[length - self.wind_size:length], weights=self.weights)
-        t_vec[1] = np.average(self.data_z[length - self.wind_size:length], weights=self.weights)
-        psi = np.average(self.data_psi[length - self.wind_size:length])
+# policy for solving the pose of the approached marker (see square_planar_marker.POSE_POLICIES)
+POSE_POLICY = 'warm-start'
 
-        return t_vec, psi
+# maximum rate of the preview window (annotated images, shown by a separate process)
+PREVIEW_RATE = 10  # [images/s]
 
 
 class CF:
@@ -204,16 +94,25 @@ class CF:
     class for crazyflie parameters, functions and methods
     """
 
-    def __init__(self, scf):
+    def __init__(self, scf, recorder=None):
         """
         constructor for a crazyflie object
         :param scf: id of SyncCrazyflie
+        :param recorder: optional flight_log.FlightRecorder, receives the telemetry of the crazyflie
         """
 
+        # telemetry is streamed for the whole connection, the latest values are read from its snapshot,
+        # earlier values from its history
+        self.telemetry = TelemetrySubscriber(scf, recorder=recorder, history=TelemetryHistory())
+        self.telemetry.start()
+        self.telemetry.wait_for_sample(timeout=5)
+
         # psi --> yaw
         # theta --> pitch
         # phi --> roll
-        self.v_bat, self.psi, self.theta, self.phi = get_cf_data(scf)
+        self.v_bat, self.psi, self.theta, self.phi = None, None, None, None
+        if self.telemetry.snapshot() is not None:
+            _, self.v_bat, self.psi, self.theta, self.phi = self.telemetry.snapshot()
         self.scf = scf
         self.mc = MotionCommander(scf)
 
@@ -246,9 +145,8 @@ class CF:
                  battery voltage in V
         """
 
-        # check current battery voltage of cf
-        voltage, _, _, _ = get_cf_data(self.scf)
-        time.sleep(0.02)
+        # check current battery voltage of cf (latest sample of the telemetry stream)
+        _, voltage, _, _, _ = self.telemetry.snapshot()
         self.v_bat = voltage
         return voltage
 
@@ -328,54 +226,99 @@ class CF:
 
         self.mc.move_distance(x, y, z, velocity=0.15)
 
+    def set_velocity(self, vx, vy, vz, rate_yaw):
+        """
+        sets the velocity setpoint of the crazyflie, does not wait for the motion
+        :param vx: forward/backward velocity in m/s
+        :param vy: left/right velocity in m/s
+        :param vz: up/down velocity in m/s
+        :param rate_yaw: degrees/second to turn
+                         positive degrees --> turn right,
+                         negative degrees --> turn left
+        :return: -
+        """
+
+        self.mc.start_linear_motion(vx, vy, vz, rate_yaw)
+
 
 if __name__ == "__main__":
     # Arguments for setting IP/port of AI deck. Default settings are for when AI-deck is in Access Point mode.
     parser = argparse.ArgumentParser(description='Connect to AI-deck JPEG streamer example')
     parser.add_argument("-n", default="192.168.4.1", metavar="ip", help="AI-deck IP")
     parser.add_argument("-p", type=int, default='5000', metavar="port", help="AI-deck port")
+    parser.add_argument('--record', action='store_true', help="Record streamed images to ./wifi_streaming/imgBuffer")
+    parser.add_argument('--record-every', type=int, default=10, metavar="n", help="Record only every n-th image")
+    parser.add_argument('--record-flight', action='store_true',
+                        help="Record all images and telemetry for replay (evaluation_scripts/replay_flight.py)")
+    parser.add_argument('--control-mode', choices=('position', 'velocity'), default=CONTROL_MODE,
+                        help="Blocking position steps or non-blocking velocity setpoints for the approach")
+    parser.add_argument('--estimator', choices=ESTIMATORS, default=ESTIMATOR,
+                        help="Estimator for the pose of the marker")
+    parser.add_argument('--pose-policy', choices=spm.POSE_POLICIES, default=POSE_POLICY,
+                        help="Solver policy for the pose of the approached marker")
+    parser.add_argument('--rectify', action='store_true',
+                        help="Remove the lens distortion of the images before detecting the approached marker")
+    parser.add_argument('--headless', action='store_true', help="Do not show the preview window")
+    parser.add_argument('--preview-rate', type=float, default=PREVIEW_RATE, metavar="hz",
+                        help="Maximum number of preview images per second")
     args = parser.parse_args()
+    if args.preview_rate <= 0:
+        parser.error("--preview-rate must be positive")
     deck_port = args.p
     deck_ip = args.n
 
-    # connect the AI deck
+    # recorder for streamed images, runs on its own thread
+    recorder = None
+    if args.record:
+        recorder = FrameRecorder("./wifi_streaming/imgBuffer", every_n=args.record_every)
+        recorder.start()
+
+    # connect the AI deck, the images are received by an asyncio client on its own thread
+    # and handed to the control loop through the frame mailbox
     print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((deck_ip, deck_port))
-    print("Socket connected")
+    frame_mailbox = aideck.FrameMailbox()
+    frame_seq = 0  # sequence number of the last processed image
+    stream_client = AsyncStreamClient(deck_ip, deck_port, frame_mailbox, recorder=recorder)
+
+    # recorder for images and telemetry of the flight, runs on its own thread
+    flight_recorder = None
+    if args.record_flight:
+        t = datetime.datetime.now()
+        flight_recorder = FlightRecorder("plot/flight_data/Flight_" + str(t.year) + "-" + str(t.month) + "-" +
+                                         str(t.day) + "T" + str(t.hour) + "-" + str(t.minute) + "-" +
+                                         str(t.second) + ".bin", frame_mailbox)
+        flight_recorder.start()
+    stream_client.start()
+    if stream_client.wait_connected(timeout=5):
+        print("Socket connected")
 
     # load calibration-data of camera
-    with open('./calibrate_camera/calibration.yaml') as f:
-        loaded_dict = yaml.safe_load(f)
-        mtx = loaded_dict.get('camera_matrix')
-        dis = loaded_dict.get('dist_coeff')
-        matrix = np.array(mtx)
-        distortion = np.array(dis)
+    matrix, distortion = load_calibration()
     print("Camera calibration loaded")
     marker_size = 20  # size in cm
 
     # setup for logging
     logging.basicConfig(level=logging.ERROR)
-    log_stabilizer = LogConfig(name="Stabilizer", period_in_ms=12)
-    log_stabilizer.add_variable('pm.vbat', 'float')
-    log_stabilizer.add_variable('stabilizer.yaw', 'float')
-    log_stabilizer.add_variable('stabilizer.pitch', 'float')
-    log_stabilizer.add_variable('stabilizer.roll', 'float')
 
     # initiate low level drivers
     cflib.crtp.init_drivers(enable_debug_driver=False)
     cf = Crazyflie(rw_cache='./cache')
 
-    # initiate filter for noise filtering
+    # initiate estimator for noise filtering
     window_size = 7  # window size of the moving average filter
-    motion_filter = MovingAverageFilter(window_size)
+    motion_filter = create_estimator(args.estimator, window_size, record=True)  # history for the filter analysis
+    attitude_data = []  # yaw, pitch, roll of the crazyflie for every measurement
+
+    preview = None  # preview window, started when the image stream is running
 
     # starting the main functionality
 
     # connect to crazyflie
     with SyncCrazyflie(URI, cf) as sync_cf:
         try:
-            crazyflie = CF(sync_cf)
+            crazyflie = CF(sync_cf, recorder=flight_recorder)
+            if crazyflie.telemetry.snapshot() is None:
+                raise exceptions.TelemetryException
             print("crazyflie initialized!")
 
             # check if extensions decks are connected
@@ -391,23 +334,27 @@ if __name__ == "__main__":
 
             print("Battery-level OK [Voltage = " + str(round(v_bat, 2)) + "V]")
 
-            # initialize global variable for image
-            image = None
-            # initialize flag to stop the image-thread
-            stop_thread_flag = False
-            # start thread for image acquisition
-            t1 = threading.Thread(target=get_image_from_ai_deck)
-            t1.start()
-            time.sleep(1)
-
             c = 0  # counter for image waiting
+            image, frame_seq, _ = frame_mailbox.wait_for_newer(frame_seq, timeout=1)
             while image is None:
                 print("Wait for image!")
-                time.sleep(2)
+                image, frame_seq, _ = frame_mailbox.wait_for_newer(frame_seq, timeout=2)
                 c += 1
                 if c > 3:  # if image can not be detected more than 3 times --> raise exception
                     raise exceptions.ImageFetchException
-            print("Image Thread started")
+            print("Image stream started")
+
+            # camera model for the image size of the stream, the undistortion maps are computed once
+            camera = None
+            pose_matrix, pose_distortion = matrix, distortion
+            if args.rectify:
+                camera = get_camera_model(matrix, distortion, (image.shape[1], image.shape[0]))
+                pose_matrix, pose_distortion = camera.new_matrix, camera.rectified_distortion
+
+            # preview of the processed images, drawn by its own process so the control loop never waits for the GUI
+            if not args.headless:
+                preview = PreviewPublisher(pose_matrix, pose_distortion, max_rate=args.preview_rate)
+                preview.start()
 
             # All checks done
 
@@ -442,10 +389,15 @@ if __name__ == "__main__":
                 marker_found = False
                 while not marker_found and elapsed_time < 10:
                     print("Search for marker with id=" + str(m))
-                    marker_ids, marker_corners = spm.detect_marker(image)
-                    cv2.imshow('spm detection', image)
-                    cv2.waitKey(1)
+                    # wait for a new image, every image is searched only once
+                    image, frame_seq, _ = frame_mailbox.wait_for_newer(frame_seq, timeout=0.5)
                     elapsed_time = time.time() - start_time
+                    if image is None:
+                        continue
+                    # coarse search, only the presence of the marker is needed here
+                    marker_ids, marker_corners = spm.detect_marker(image, profile='search')
+                    if preview is not None:
+                        preview.publish(image)
                     # if marker is found exit searching loop and let the crazyflie hover
                     if marker_ids is not None and m in marker_ids:
                         crazyflie.stop()  # stop the searching motion
@@ -458,74 +410,102 @@ if __name__ == "__main__":
                 # the marker gets out of the image frame
                 marker_ids = None
                 while marker_ids is None:
+                    image, frame_seq, _ = frame_mailbox.wait_for_newer(frame_seq)
                     marker_ids, marker_corners = spm.detect_marker(image)
 
                 # now perform control-loop for marker with id == m
                 for c, i in enumerate(marker_ids):  # if multiple markers are in frame, iterate over them
 
                     if i == m:  # if the desired marker is found
-                        # counter for entering the controlling; first 'window_size' values must be appended,
-                        # to perform filtering
-                        filter_count = 0
+                        # track the marker in a region of interest around its last position
+                        tracker = spm.MarkerTracker(m)
+
+                        # perception runs as a pipeline: acquisition --> detection --> pose --> filter,
+                        # every stage on its own worker; the control loop only takes the latest filtered pose
+                        # solve the pose of the tracked marker, warm-started from the previous image by default
+                        solver = spm.PoseSolver(marker_size, pose_matrix, pose_distortion, args.pose_policy)
+
+                        motion_filter.reset()  # poses of the last marker must not be used
+                        # the preview shows the images after the pipeline --> take them out of the frame ring
+                        source = MailboxSource(frame_mailbox, copy=preview is not None)
+                        perception = Pipeline(source, marker_stages(tracker, marker_size, matrix, distortion,
+                                                                    motion_filter, solver, camera,
+                                                                    crazyflie.telemetry.history, attitude_data))
+                        perception.start()
 
                         mag_goal = 1  # set to 1, to enter the loop
+                        failed_stage = None
                         # initialize timeout
                         start_time = time.time()
                         elapsed_time = 0
 
                         # control loop -- approach marker until distance to goal is > 5cm
                         while mag_goal > 0.1 and elapsed_time < 5:
-                            marker_ids, marker_corners = spm.detect_marker(image)  # detect markers in image
-                            if marker_ids is not None:  # if there is a marker
-                                for d, j in enumerate(
-                                        marker_ids):  # if multiple markers are in frame, iterate over them
-                                    if j == m:  # if the desired marker is found
-
-                                        start_time = time.time()  # marker found --> reset timeout
-
-                                        # estimate pose of the marker
-                                        trans_vec, rot_vec, euler_angles = spm.estimate_marker_pose(marker_corners[d],
-                                                                                                    marker_size, matrix,
-                                                                                                    distortion)
-                                        # append measured values to moving average filter
-                                        motion_filter.append(trans_vec, euler_angles)
-
-                                        # show image
-                                        cv2.imshow('spm detection', image)
-                                        cv2.waitKey(1)
-
-                                        # get filtered signal and execute trajectory
-                                        if filter_count > window_size:  # if enough data is available
-                                            # get lowpass-filtered data
-                                            linear_motion, yaw_motion = motion_filter.get_weighted_moving_average()
-
-                                            # subtract vectors to get the trajectory to the destination coordinates
-                                            # divide by 100 to get from cm to m
-                                            goal = (linear_motion - DISTANCE) / 100
-
-                                            # calculate distance to marker,
-                                            mag_goal = math.sqrt(goal[0] ** 2 + goal[1] ** 2 + goal[2] ** 2)
-
-                                            # trajectory is 1/25 of the vector towards the destination coordinates
-                                            trajectory = goal / 25
-
-                                            # fly towards the marker
-                                            crazyflie.move(trajectory[2], -trajectory[0], -trajectory[1])
-
-                                            # align towards the marker, 1/8 of the measured yaw-angle
-                                            # also convert from rad to degrees
-                                            crazyflie.turn(yaw_motion * 180 / (math.pi * 8))
+                            # wait for the next filtered pose of the marker, at most until the crazyflie has to hover
+                            sample = perception.get(timeout=POSE_TIMEOUT)
+                            if sample is None:
+                                failed_stage = perception.failed_stage()
+                                if failed_stage is not None:
+                                    # a dead or failing stage will not produce any pose --> abort the approach
+                                    print("Error: Perception stage '" + failed_stage + "' failed")
+                                    break
+                                elapsed_time = time.time() - start_time  # timer for loop iteration
+                                if args.control_mode == 'velocity' and elapsed_time > POSE_TIMEOUT:
+                                    crazyflie.stop()  # no new pose --> hover instead of keeping the last setpoint
+                                continue
+
+                            start_time = time.time()  # marker found --> reset timeout
+
+                            # show image with the measured pose of the marker
+                            if preview is not None:
+                                preview.publish(sample['image'], (sample['corners'], m, sample['t_vec'],
+                                                                  sample['r_vec'], sample['euler_angles']))
+
+                            # filtered pose, predicted to the current time (compensates the perception latency
+                            # for estimators with a motion model)
+                            linear_motion, yaw_motion = motion_filter.get_estimate(time.time())
+
+                            # subtract vectors to get the trajectory to the destination coordinates
+                            # divide by 100 to get from cm to m
+                            goal = (linear_motion - DISTANCE) / 100
+
+                            # calculate distance to marker,
+                            mag_goal = math.sqrt(goal[0] ** 2 + goal[1] ** 2 + goal[2] ** 2)
+
+                            if args.control_mode == 'velocity':
+                                # velocity towards the destination coordinates and yaw rate towards the marker,
+                                # proportional to the remaining way
+                                velocity = np.clip(goal * VELOCITY_GAIN, -MAX_VELOCITY, MAX_VELOCITY)
+                                yaw_rate = np.clip(yaw_motion * 180 / math.pi * YAW_RATE_GAIN,
+                                                   -MAX_YAW_RATE, MAX_YAW_RATE)
+
+                                # update the setpoint, the crazyflie keeps moving while the next image is processed
+                                crazyflie.set_velocity(velocity[2], -velocity[0], -velocity[1], yaw_rate)
+                            else:
+                                # trajectory is 1/25 of the vector towards the destination coordinates
+                                trajectory = goal / 25
+
+                                # fly towards the marker
+                                crazyflie.move(trajectory[2], -trajectory[0], -trajectory[1])
+
+                                # align towards the marker, 1/8 of the measured yaw-angle
+                                # also convert from rad to degrees
+                                crazyflie.turn(yaw_motion * 180 / (math.pi * 8))
 
                             elapsed_time = time.time() - start_time  # timer for loop iteration
 
-                            filter_count += 1  # increment, to fill the filter with data before fetching filtered data
-
-                            # print time, that current loop-iteration took
-                            # print("RTT:" + str(time.time() - start_time))
-
+                        perception.stop()
+                        frame_seq = source.seq
+                        if solver.durations:
+                            print("Pose solver ({}): median {:.3f}ms per solve".format(
+                                args.pose_policy, np.median(solver.durations) * 1000))
                         crazyflie.stop()  # stop any motion
-                        aligned = True
-                        print("----> Aligned to marker with id=" + str(m))
+                        # the loop also ends without a new pose for 5 seconds or if the perception failed
+                        aligned = mag_goal <= 0.1
+                        if aligned:
+                            print("----> Aligned to marker with id=" + str(m))
+                        elif failed_stage is None:
+                            print("Timeout while approaching marker with id=" + str(m))
                         time.sleep(2)  # wait 2 seconds
                         crazyflie.back(0.6)  # backup before searching for next marker
                         break  # break loop --> go to next marker
@@ -537,6 +517,9 @@ if __name__ == "__main__":
         except exceptions.DeckException:
             print("Error: At least one deck not detected")
 
+        except exceptions.TelemetryException:
+            print("Error: No telemetry received from crazyflie")
+
         except exceptions.ImageFetchException:
             print("Error: Image can not be fetched from AI deck")
 
@@ -545,88 +528,29 @@ if __name__ == "__main__":
             if e.cf_takeoff:  # if crazyflie already took off --> land
                 print("----> crazyflie is landing")
                 crazyflie.land()  # land
-                stop_thread_flag = True  # terminate image thread
-                t1.join()  # join image thread
+                stream_client.stop()  # terminate image stream
                 time.sleep(2)  # wait
-                client_socket.close()  # close WiFi socket
 
         except KeyboardInterrupt:
             print("Error: Application was stopped!")
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
 
         else:
             # when all markers are processed --> land
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
-
-            # save motion data for analyzing
-            moving_averages_x = []
-            moving_averages_y = []
-            moving_averages_z = []
-            moving_averages_psi = []
-
-            w_moving_averages_x = []
-            w_moving_averages_y = []
-            w_moving_averages_z = []
-            w_moving_averages_psi = []
-
-            i = 0
-            while i < len(motion_filter.data_x) - window_size + 1:
-                # Calculate the moving average of current window
-                window_average_x = np.average(motion_filter.data_x[i:i + window_size])
-                window_average_y = np.average(motion_filter.data_y[i:i + window_size])
-                window_average_z = np.average(motion_filter.data_z[i:i + window_size])
-                window_average_psi = np.average(motion_filter.data_psi[i:i + window_size])
-
-                # Calculate the weighted moving average of current window
-
-                w_window_average_x = np.average(motion_filter.data_x[i:i + window_size], weights=motion_filter.weights)
-                w_window_average_y = np.average(motion_filter.data_y[i:i + window_size], weights=motion_filter.weights)
-                w_window_average_z = np.average(motion_filter.data_z[i:i + window_size], weights=motion_filter.weights)
-                w_window_average_psi = np.average(motion_filter.data_psi[i:i + window_size],
-                                                  weights=motion_filter.weights)
-
-                # Store the average of current
-                # window in moving average list
-                moving_averages_x.append(window_average_x)
-                moving_averages_y.append(window_average_y)
-                moving_averages_z.append(window_average_z)
-                moving_averages_psi.append(window_average_psi)
-
-                w_moving_averages_x.append(w_window_average_x)
-                w_moving_averages_y.append(w_window_average_y)
-                w_moving_averages_z.append(w_window_average_z)
-                w_moving_averages_psi.append(w_window_average_psi)
-
-                # Shift window to right by one position
-                i += 1
-
-            data = {'unfiltered_x': np.asarray(motion_filter.data_x).tolist(),
-                    'filtered_x': np.asarray(moving_averages_x).tolist(),
-                    'w_filtered_x': np.asarray(w_moving_averages_x).tolist(),
-
-                    'unfiltered_y': np.asarray(motion_filter.data_y).tolist(),
-                    'filtered_y': np.asarray(moving_averages_y).tolist(),
-                    'w_filtered_y': np.asarray(w_moving_averages_y).tolist(),
-
-                    'unfiltered_z': np.asarray(motion_filter.data_z).tolist(),
-                    'filtered_z': np.asarray(moving_averages_z).tolist(),
-                    'w_filtered_z': np.asarray(w_moving_averages_z).tolist(),
-
-                    'unfiltered_psi': np.asarray(motion_filter.data_psi).tolist(),
-                    'filtered_psi': np.asarray(moving_averages_psi).tolist(),
-                    'w_filtered_psi': np.asarray(w_moving_averages_psi).tolist(),
-
-                    }
+
+            # save motion data for analyzing, the moving averages are computed for the whole flight at once
+            data = filter_analysis.analyse_log({'x': motion_filter.data_x, 'y': motion_filter.data_y,
+                                                'z': motion_filter.data_z, 'psi': motion_filter.data_psi},
+                                               window_size, filter_analysis.harmonic_weights(window_size))
+            data['cf_attitude'] = attitude_data
+
             t = datetime.datetime.now()
             filename = "Log_" + str(t.year) + "-" + str(t.month) + "-" + str(t.day) + "T" + str(t.hour) + "-" + \
                        str(t.minute) + "-" + str(t.second)
@@ -643,7 +567,12 @@ if __name__ == "__main__":
             # when all markers are processed --> land
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
+            if recorder is not None:
+                recorder.stop()  # write remaining recorded images
+            if flight_recorder is not None:
+                flight_recorder.stop()  # close flight recording
+            if preview is not None:
+                preview.stop()  # close preview window
             print("Application ended!")
@@ -8,7 +8,11 @@ from cv2 import aruco
 import yaml
 import numpy as np
 from pathlib import Path
-from tqdm import tqdm
+
+from camera_model import get_camera_model
+from calibration import load_calibration
+from calibration_pipeline import detect_images, collect_detections
+from calibration_subset import image_statistics, scoring_calibration, select_subset
 
 # root directory of repo for relative path specification.
 root = Path(__file__).parent.absolute()
@@ -16,6 +20,10 @@ root = Path(__file__).parent.absolute()
 # Set this flsg True for calibrating camera and False for validating results real time
 calibrate_camera = True
 
+# Number of images for the calibration, chosen by calibration_subset.py (None --> all images)
+# the images are scored with the previous calibration.yaml, or with a calibration of all images if it does not fit
+subset_size = None
+
 # Set path to the images
 calib_imgs_path = root.joinpath("images")
 
@@ -37,79 +45,73 @@ board = aruco.GridBoard_create(4, 5, markerLength, markerSeparation, aruco_dict)
 
 arucoParams = aruco.DetectorParameters_create()
 
-if calibrate_camera == True:
-    img_list = []
-    calib_fnms = calib_imgs_path.glob('*.png')
-    print('Using ...', end='')
-    for idx, fn in enumerate(calib_fnms):
-        print(idx, '', end='')
-        img = cv2.imread( str(root.joinpath(fn) ))
-        img_list.append( img )
-        h, w, c = img.shape
-    print('Calibration images')
-
-    counter, corners_list, id_list = [], [], []
-    first = True
-    for im in tqdm(img_list):
-        img_gray = cv2.cvtColor(im,cv2.COLOR_RGB2GRAY)
-        corners, ids, rejectedImgPoints = aruco.detectMarkers(img_gray, aruco_dict, parameters=arucoParams)
-        if first == True:
-            corners_list = corners
-            id_list = ids
-            first = False
-        else:
-            corners_list = np.vstack((corners_list, corners))
-            id_list = np.vstack((id_list,ids))
-        counter.append(len(ids))
-    print('Found {} unique markers'.format(np.unique(ids)))
-
-    counter = np.array(counter)
-    print ("Calibrating camera .... Please wait...")
-    #mat = np.zeros((3,3), float)
-    ret, mtx, dist, rvecs, tvecs = aruco.calibrateCameraAruco(corners_list, id_list, counter, board, img_gray.shape, None, None )
-
-    print("Camera matrix is \n", mtx, "\n And is stored in calibration.yaml file along with distortion coefficients : \n", dist)
-    data = {'camera_matrix': np.asarray(mtx).tolist(), 'dist_coeff': np.asarray(dist).tolist()}
-    with open("calibration.yaml", "w") as f:
-        yaml.dump(data, f)
-
-else:
-    camera = cv2.VideoCapture(0)
-    ret, img = camera.read()
-
-    with open('calibration.yaml') as f:
-        loadeddict = yaml.load(f)
-    mtx = loadeddict.get('camera_matrix')
-    dist = loadeddict.get('dist_coeff')
-    mtx = np.array(mtx)
-    dist = np.array(dist)
-
-    ret, img = camera.read()
-    img_gray = cv2.cvtColor(img,cv2.COLOR_RGB2GRAY)
-    h,  w = img_gray.shape[:2]
-    newcameramtx, roi=cv2.getOptimalNewCameraMatrix(mtx,dist,(w,h),1,(w,h))
-
-    pose_r, pose_t = [], []
-    while True:
+# the calibration images are detected in worker processes, they import this module
+if __name__ == "__main__":
+    if calibrate_camera == True:
+        calib_fnms = sorted(calib_imgs_path.glob('*.png'))
+        print('Using {} calibration images'.format(len(calib_fnms)))
+
+        # images are decoded and detected in worker processes, detections of known images are taken from the cache
+        detections, new = detect_images(calib_fnms, aruco.DICT_6X6_1000)
+        print('Detected markers in {} new images ({} cached)'.format(new, len(calib_fnms) - new))
+        if subset_size is not None:
+            # compact subset of informative images, scored with the current calibration
+            matrix, distortion, bootstrap = scoring_calibration(detections, board)
+            if bootstrap:
+                print('No matching previous calibration --> images are scored with a calibration of all images')
+            statistics = image_statistics(detections, board, matrix, distortion)
+            selected = select_subset(statistics, subset_size)
+            print('Selected {} images: {}'.format(len(selected), ', '.join(calib_fnms[i].name for i in selected)))
+            detections = [detections[i] for i in selected]
+        corners_list, id_list, counter = collect_detections(detections)
+        print('Found {} unique markers'.format(np.unique(id_list)))
+
+        print ("Calibrating camera .... Please wait...")
+        #mat = np.zeros((3,3), float)
+        ret, mtx, dist, rvecs, tvecs = aruco.calibrateCameraAruco(corners_list, id_list, counter, board,
+                                                                  detections[0][2], None, None)
+
+        print("Camera matrix is \n", mtx, "\n And is stored in calibration.yaml file along with distortion coefficients : \n", dist)
+        data = {'camera_matrix': np.asarray(mtx).tolist(), 'dist_coeff': np.asarray(dist).tolist()}
+        with open(root.joinpath("calibration.yaml"), "w") as f:
+            yaml.dump(data, f)
+
+    else:
+        camera = cv2.VideoCapture(0)
+        ret, img = camera.read()
+
+        mtx, dist = load_calibration()
+
         ret, img = camera.read()
-        img_aruco = img
-        im_gray = cv2.cvtColor(img,cv2.COLOR_RGB2GRAY)
-        h,  w = im_gray.shape[:2]
-        dst = cv2.undistort(im_gray, mtx, dist, None, newcameramtx)
-        corners, ids, rejectedImgPoints = aruco.detectMarkers(dst, aruco_dict, parameters=arucoParams)
-        #cv2.imshow("original", img_gray)
-        if corners == None:
-            print ("pass")
-        else:
-
-            ret, rvec, tvec = aruco.estimatePoseBoard(corners, ids, board, newcameramtx, dist) # For a board
-            print ("Rotation ", rvec, "Translation", tvec)
-            if ret != 0:
-                img_aruco = aruco.drawDetectedMarkers(img, corners, ids, (0,255,0))
-                img_aruco = aruco.drawAxis(img_aruco, newcameramtx, dist, rvec, tvec, 10)    # axis length 100 can be changed according to your requirement
-
-            if cv2.waitKey(0) & 0xFF == ord('q'):
-                break;
-        cv2.imshow("World co-ordinate frame axes", img_aruco)
-
-cv2.destroyAllWindows()
+        img_gray = cv2.cvtColor(img,cv2.COLOR_RGB2GRAY)
+        h,  w = img_gray.shape[:2]
+        # new camera matrix and undistortion maps are computed once for the image size
+        camera_model = get_camera_model(mtx, dist, (w, h), alpha=1)
+        newcameramtx = camera_model.new_matrix
+
+        pose_r, pose_t = [], []
+        while True:
+            ret, img = camera.read()
+            img_aruco = img
+            im_gray = cv2.cvtColor(img,cv2.COLOR_RGB2GRAY)
+            h,  w = im_gray.shape[:2]
+            dst = camera_model.rectify(im_gray)
+            corners, ids, rejectedImgPoints = aruco.detectMarkers(dst, aruco_dict, parameters=arucoParams)
+            #cv2.imshow("original", img_gray)
+            if corners == None:
+                print ("pass")
+            else:
+
+                # the rectified image has no lens distortion
+                ret, rvec, tvec = aruco.estimatePoseBoard(corners, ids, board, newcameramtx,
+                                                          camera_model.rectified_distortion) # For a board
+                print ("Rotation ", rvec, "Translation", tvec)
+                if ret != 0:
+                    img_aruco = aruco.drawDetectedMarkers(img, corners, ids, (0,255,0))
+                    img_aruco = aruco.drawAxis(img_aruco, newcameramtx, camera_model.rectified_distortion, rvec, tvec, 10)    # axis length 100 can be changed according to your requirement
+
+                if cv2.waitKey(0) & 0xFF == ord('q'):
+                    break;
+            cv2.imshow("World co-ordinate frame axes", img_aruco)
+
+    cv2.destroyAllWindows()
@@ -0,0 +1,149 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import cv2
+from cv2 import aruco
+import numpy as np
+
+# root directory of the calibration
+root = Path(__file__).parent.absolute()
+
+# directory of the cached detections, one file per image and dictionary
+DETECTION_CACHE_DIR = root.joinpath("cache", "detections")
+
+# detector of the worker process, created once per process (cv2 objects can not be sent to a process)
+_detector = {}
+
+
+def file_hash(path):
+    """
+    :param path: path of a file
+    :return: string: hash
+             sha1 of the file content
+    """
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def detect_board_markers(path, dictionary_id):
+    """
+    detects the markers of the calibration board in an image (runs in a worker process)
+    :param path: path of the image
+    :param dictionary_id: aruco dictionary of the board, e.g., aruco.DICT_6X6_1000
+    :return: double array[]: corners,
+             int array[]: ids,
+             tuple: shape
+             corners (n x 4 x 2) and ids (n x 1) of the detected markers, shape of the grayscale image
+    """
+    if dictionary_id not in _detector:
+        _detector[dictionary_id] = (aruco.getPredefinedDictionary(dictionary_id), aruco.DetectorParameters_create())
+    dictionary, parameters = _detector[dictionary_id]
+
+    img_gray = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_RGB2GRAY)
+    corners, ids, rejected = aruco.detectMarkers(img_gray, dictionary, parameters=parameters)
+    if ids is None:
+        return np.zeros((0, 4, 2), np.float32), np.zeros((0, 1), np.int32), img_gray.shape
+    return np.concatenate(corners).astype(np.float32), ids.astype(np.int32), img_gray.shape
+
+
+def _cache_path(image_hash, dictionary_id):
+    """
+    :param image_hash: hash of the image file
+    :param dictionary_id: aruco dictionary of the board
+    :return: Path: path
+             path of the cached detection
+    """
+    return DETECTION_CACHE_DIR.joinpath("{}_{}.npz".format(image_hash, dictionary_id))
+
+
+def _load_cached(image_hash, dictionary_id):
+    """
+    :param image_hash: hash of the image file
+    :param dictionary_id: aruco dictionary of the board
+    :return: tuple: detection
+             (corners, ids, shape) as returned by detect_board_markers(), None if not cached
+    """
+    try:
+        with np.load(_cache_path(image_hash, dictionary_id)) as cache:
+            return cache['corners'], cache['ids'], tuple(cache['shape'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_cached(image_hash, dictionary_id, detection):
+    """
+    :param image_hash: hash of the image file
+    :param dictionary_id: aruco dictionary of the board
+    :param detection: (corners, ids, shape) as returned by detect_board_markers()
+    :return: -
+    """
+    corners, ids, shape = detection
+    try:
+        DETECTION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(_cache_path(image_hash, dictionary_id), "wb") as f:
+            np.savez(f, corners=corners, ids=ids, shape=np.array(shape))
+    except OSError:
+        pass  # read-only checkout, the detection is still valid
+
+
+def detect_images(paths, dictionary_id, workers=None, use_cache=True):
+    """
+    detects the board markers in all images, images that were not detected before are decoded and
+    detected in a pool of worker processes; the detections are cached by the hash of the image file
+    :param paths: paths of the calibration images
+    :param dictionary_id: aruco dictionary of the board, e.g., aruco.DICT_6X6_1000
+    :param workers: number of worker processes, None --> number of cpus
+    :param use_cache: if False, all images are detected again (the cache is still updated)
+    :return: list: detections,
+             int: new
+             (corners, ids, shape) of every image in the order of paths, number of detected (not cached) images
+    """
+    paths = [Path(p) for p in paths]
+    hashes = [file_hash(p) for p in paths]
+    detections = [_load_cached(h, dictionary_id) if use_cache else None for h in hashes]
+    missing = [i for i, detection in enumerate(detections) if detection is None]
+
+    if len(missing) > 0:
+        workers = workers or os.cpu_count() or 1
+        missing_paths = [paths[i] for i in missing]
+        if workers == 1 or len(missing) == 1:
+            results = [detect_board_markers(p, dictionary_id) for p in missing_paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(detect_board_markers, missing_paths, [dictionary_id] * len(missing),
+                                            chunksize=max(1, len(missing) // (4 * workers))))
+        for i, detection in zip(missing, results):
+            detections[i] = detection
+            _save_cached(hashes[i], dictionary_id, detection)
+
+    return detections, len(missing)
+
+
+def collect_detections(detections):
+    """
+    collects the detections of all images in the input format of aruco.calibrateCameraAruco,
+    the arrays are allocated once (images without markers are left out)
+    :param detections: list of (corners, ids, shape) as returned by detect_images()
+    :return: double array[]: corners_list,
+             int array[]: id_list,
+             int array[]: counter
+             corners (N x 1 x 4 x 2) and ids (N x 1) of all markers, number of markers of every used image
+    """
+    counter = np.array([len(ids) for corners, ids, shape in detections if len(ids) > 0], dtype=np.int32)
+    total = int(counter.sum())
+    corners_list = np.empty((total, 1, 4, 2), np.float32)
+    id_list = np.empty((total, 1), np.int32)
+
+    start = 0
+    for corners, ids, shape in detections:
+        end = start + len(ids)
+        corners_list[start:end, 0] = corners
+        id_list[start:end] = ids
+        start = end
+    return corners_list, id_list, counter
@@ -0,0 +1,245 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import argparse
+import math
+import time
+from pathlib import Path
+import cv2
+from cv2 import aruco
+import numpy as np
+
+from calibration import DEFAULT_CAMERA, load_calibration
+from calibration_pipeline import detect_images, collect_detections
+
+# grid of image cells for the board coverage (columns, rows)
+COVERAGE_GRID = (8, 6)
+
+# weights of the frame score: coverage, pose diversity, residual
+SCORE_WEIGHTS = (1.0, 1.0, 0.5)
+
+# a previous calibration with a larger median rms reprojection error [px] does not belong to the images
+MAX_PRIOR_RESIDUAL = 2.0
+
+
+def board_object_points(board):
+    """
+    :param board: aruco board of the calibration
+    :return: dict: object_points
+             corner coordinates (4 x 3) on the board by marker id
+    """
+    return {int(marker_id): np.asarray(points, dtype=np.float32)
+            for marker_id, points in zip(board.ids.flatten(), board.objPoints)}
+
+
+def _matched_points(detection, object_points):
+    """
+    :param detection: (corners, ids, shape) of an image, see calibration_pipeline.detect_images()
+    :param object_points: corner coordinates on the board by marker id, see board_object_points()
+    :return: double array[]: obj,
+             double array[]: img
+             matching board (n x 3) and image (n x 2) points of all detected markers
+    """
+    corners, ids, shape = detection
+    known = [i for i, marker_id in enumerate(ids.flatten()) if int(marker_id) in object_points]
+    obj = np.array([object_points[int(ids[i, 0])] for i in known], dtype=np.float32).reshape(-1, 3)
+    img = corners[known].reshape(-1, 2).astype(np.float32)
+    return obj, img
+
+
+def _reprojection_errors(detection, object_points, matrix, distortion):
+    """
+    estimates the board pose of an image and the reprojection errors of its corners
+    :param detection: (corners, ids, shape) of an image
+    :param object_points: corner coordinates on the board by marker id
+    :param matrix: camera calibration matrix
+    :param distortion: camera calibration distortion coefficients
+    :return: double array[]: r_vec,
+             double array[]: errors
+             rotation vector of the board, distance in pixels of every projected corner (None if no pose)
+    """
+    obj, img = _matched_points(detection, object_points)
+    if len(obj) < 4:
+        return None, None
+    ret, r_vec, t_vec = cv2.solvePnP(obj, img, matrix, distortion)
+    if not ret:
+        return None, None
+    projected, _ = cv2.projectPoints(obj, r_vec, t_vec, matrix, distortion)
+    return r_vec, np.linalg.norm(projected.reshape(-1, 2) - img, axis=1)
+
+
+def image_statistics(detections, board, matrix, distortion, grid=COVERAGE_GRID):
+    """
+    computes the scores of all calibration images with a previous calibration
+    :param detections: list of (corners, ids, shape), see calibration_pipeline.detect_images()
+    :param board: aruco board of the calibration
+    :param matrix: previous camera calibration matrix
+    :param distortion: previous camera calibration distortion coefficients
+    :param grid: grid of image cells for the coverage (columns, rows)
+    :return: dict: statistics
+             'coverage' (images x cells, covered cells), 'normals' (images x 3, board normal in the camera frame),
+             'residuals' (images, rms reprojection error), 'valid' (images, pose found)
+    """
+    object_points = board_object_points(board)
+    coverage = np.zeros((len(detections), grid[0] * grid[1]), dtype=bool)
+    normals = np.zeros((len(detections), 3))
+    residuals = np.full(len(detections), np.inf)
+
+    for i, detection in enumerate(detections):
+        corners, ids, shape = detection
+        if len(ids) == 0:
+            continue
+        # cells of the image that contain a corner of the board
+        points = corners.reshape(-1, 2)
+        columns = np.clip((points[:, 0] * grid[0] / shape[1]).astype(int), 0, grid[0] - 1)
+        rows = np.clip((points[:, 1] * grid[1] / shape[0]).astype(int), 0, grid[1] - 1)
+        coverage[i, rows * grid[0] + columns] = True
+
+        r_vec, errors = _reprojection_errors(detection, object_points, matrix, distortion)
+        if r_vec is None:
+            continue
+        normals[i] = cv2.Rodrigues(r_vec)[0][:, 2]
+        residuals[i] = math.sqrt(np.mean(errors ** 2))
+
+    return {'coverage': coverage, 'normals': normals, 'residuals': residuals, 'valid': np.isfinite(residuals)}
+
+
+def select_subset(statistics, size, weights=SCORE_WEIGHTS):
+    """
+    chooses a subset of the calibration images greedily, every step takes the image with the best score
+    score = coverage of cells that are not covered yet + angle to the most similar board pose - relative residual
+    :param statistics: image statistics, see image_statistics()
+    :param size: number of images of the subset
+    :param weights: weights of coverage, pose diversity and residual
+    :return: list: selected
+             indices of the selected images in the order of selection
+    """
+    coverage, normals = statistics['coverage'], statistics['normals']
+    valid = statistics['valid']
+    w_coverage, w_diversity, w_residual = weights
+    residual = np.zeros(len(valid))
+    residual[valid] = statistics['residuals'][valid] / np.median(statistics['residuals'][valid])
+
+    selected = []
+    covered = np.zeros(coverage.shape[1], dtype=bool)
+    for _ in range(min(size, int(valid.sum()))):
+        gain = (coverage & ~covered).sum(axis=1) / coverage.shape[1]
+        if len(selected) > 0:
+            # angle between the board normals, normalized by 90 degrees
+            cosine = np.clip(normals @ normals[selected].T, -1, 1)
+            diversity = np.arccos(cosine).min(axis=1) / (math.pi / 2)
+        else:
+            diversity = np.zeros(len(valid))
+        score = w_coverage * gain + w_diversity * diversity - w_residual * residual
+        score[~valid] = -np.inf
+        score[selected] = -np.inf
+
+        best = int(np.argmax(score))
+        selected.append(best)
+        covered |= coverage[best]
+    return selected
+
+
+def calibrate(detections, board):
+    """
+    calibrates the camera with the detections of a set of images
+    :param detections: list of (corners, ids, shape)
+    :param board: aruco board of the calibration
+    :return: double: error,
+             double array[[]]: matrix,
+             double array[[]]: distortion
+             rms reprojection error of the used images, camera calibration matrix and distortion coefficients
+    """
+    corners_list, id_list, counter = collect_detections(detections)
+    ret, mtx, dist, rvecs, tvecs = aruco.calibrateCameraAruco(corners_list, id_list, counter, board,
+                                                              detections[0][2], None, None)
+    return ret, mtx, dist
+
+
+def scoring_calibration(detections, board, camera_id=DEFAULT_CAMERA):
+    """
+    returns the calibration for scoring the images: the registered calibration of the camera at the
+    resolution of the images if it fits the images, otherwise a bootstrap calibration with all images
+    (e.g., fresh checkout, new camera or resolution)
+    :param detections: list of (corners, ids, shape) of all images
+    :param board: aruco board of the calibration
+    :param camera_id: id of the camera, see calibration.load_calibration()
+    :return: double array[[]]: matrix,
+             double array[[]]: distortion,
+             boolean: bootstrap
+             camera calibration matrix and distortion coefficients, True if they were bootstrapped
+    """
+    height, width = detections[0][2]
+    try:
+        matrix, distortion = load_calibration(camera_id, (width, height))
+        statistics = image_statistics(detections, board, matrix, distortion)
+        valid = statistics['valid']
+        if valid.any() and np.median(statistics['residuals'][valid]) <= MAX_PRIOR_RESIDUAL:
+            return matrix, distortion, False
+    except (KeyError, OSError, ValueError):
+        pass  # no previous calibration for this camera and resolution
+    _, matrix, distortion = calibrate(detections, board)
+    return matrix, distortion, True
+
+
+def evaluate_subsets(detections, board, order, sizes):
+    """
+    calibrates the camera with the first images of the selection for several subset sizes,
+    every calibration is evaluated on all images (pose of the board estimated with the calibration)
+    :param detections: list of (corners, ids, shape) of all images
+    :param board: aruco board of the calibration
+    :param order: indices of the images in the order of selection, see select_subset()
+    :param sizes: subset sizes to compare
+    :return: list: results
+             dict per size: 'size', 'duration' (s), 'rms_subset', 'rms_all' (px), 'camera_matrix', 'dist_coeff'
+    """
+    object_points = board_object_points(board)
+    results = []
+    for size in sizes:
+        subset = [detections[i] for i in order[:size]]
+        start_time = time.perf_counter()
+        rms_subset, mtx, dist = calibrate(subset, board)
+        duration = time.perf_counter() - start_time
+
+        errors = [_reprojection_errors(d, object_points, mtx, dist)[1] for d in detections if len(d[1]) > 0]
+        errors = np.concatenate([e for e in errors if e is not None])
+        results.append({'size': size, 'duration': duration, 'rms_subset': rms_subset,
+                        'rms_all': math.sqrt(np.mean(errors ** 2)), 'camera_matrix': mtx, 'dist_coeff': dist})
+    return results
+
+
+if __name__ == "__main__":
+    # e.g., python calibration_subset.py --sizes 8 12 16 24
+    parser = argparse.ArgumentParser(description='Select a compact subset of the calibration images')
+    parser.add_argument("--images", default=str(Path(__file__).parent.joinpath("images")),
+                        help="directory of the calibration images (*.png)")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[8, 12, 16, 24, 32],
+                        help="subset sizes to compare")
+    parser.add_argument("--all", action='store_true', help="also calibrate with all images for comparison")
+    args = parser.parse_args()
+
+    # same board as calibrate_camera.py
+    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_6X6_1000)
+    board = aruco.GridBoard_create(4, 5, 3.75, 0.5, aruco_dict)
+
+    calib_fnms = sorted(Path(args.images).glob('*.png'))
+    detections, new = detect_images(calib_fnms, aruco.DICT_6X6_1000)
+    print('Detected markers in {} new images ({} cached)'.format(new, len(calib_fnms) - new))
+
+    # the images are scored with the current calibration (bootstrapped with all images if there is none)
+    matrix, distortion, bootstrap = scoring_calibration(detections, board)
+    if bootstrap:
+        print('No matching previous calibration --> images are scored with a calibration of all images')
+    statistics = image_statistics(detections, board, matrix, distortion)
+    order = select_subset(statistics, max(args.sizes))
+    print('Selection: ' + ', '.join(calib_fnms[i].name for i in order))
+
+    sizes = sorted(args.sizes) + ([len(calib_fnms)] if args.all else [])
+    if args.all:
+        order = order + [i for i in range(len(calib_fnms)) if i not in order]
+    for result in evaluate_subsets(detections, board, order, sizes):
+        print("{:>3} images: calibration {:.2f}s | rms subset {:.4f}px | rms all images {:.4f}px".format(
+            result['size'], result['duration'], result['rms_subset'], result['rms_all']))
@@ -39,8 +39,8 @@
 
 import argparse
 import time
-import socket,os,struct, time
-import numpy as np
+
+import aideck_stream as aideck
 
 # Args for setting IP/port of AI-deck. Default settings are for when
 # AI-deck is in AP mode.
@@ -54,72 +54,35 @@ deck_port = args.p
 deck_ip = args.n
 
 print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client_socket.connect((deck_ip, deck_port))
+client_socket = aideck.connect(deck_ip, deck_port)
+frame_receiver = aideck.FrameReceiver(client_socket)
 print("Socket connected")
 
-imgdata = None
-data_buffer = bytearray()
-
-
-def rx_bytes(size):
-  data = bytearray()
-  while len(data) < size:
-    data.extend(client_socket.recv(size-len(data)))
-  return data
-
 import cv2
 
 start = time.time()
 count = 0
 
 while(1):
-    # First get the info
-    packetInfoRaw = rx_bytes(4)
-    #print(packetInfoRaw)
-    [length, routing, function] = struct.unpack('<HBB', packetInfoRaw)
-    #print("Length is {}".format(length))
-    #print("Route is 0x{:02X}->0x{:02X}".format(routing & 0xF, routing >> 4))
-    #print("Function is 0x{:02X}".format(function))
-
-    imgHeader = rx_bytes(length - 2)
-    #print(imgHeader)
-    #print("Length of data is {}".format(len(imgHeader)))
-    [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', imgHeader)
-
-    if magic == 0xBC:
-      #print("Magic is good")
-      #print("Resolution is {}x{} with depth of {} byte(s)".format(width, height, depth))
-      #print("Image format is {}".format(format))
-      #print("Image size is {} bytes".format(size))
-
-      # Now we start rx the image, this will be split up in packages of some size
-      imgStream = bytearray()
+    # receive the next image with the shared AI deck stream functions
+    imgStream, [width, height, depth, format, size] = frame_receiver.receive_frame()
+    #print("Resolution is {}x{} with depth of {} byte(s)".format(width, height, depth))
+    #print("Image format is {}".format(format))
+    #print("Image size is {} bytes".format(size))
 
-      while len(imgStream) < size:
-          packetInfoRaw = rx_bytes(4)
-          [length, dst, src] = struct.unpack('<HBB', packetInfoRaw)
-          #print("Chunk size is {} ({:02X}->{:02X})".format(length, src, dst))
-          chunk = rx_bytes(length - 2)
-          imgStream.extend(chunk)
-     
-      count = count + 1
-      meanTimePerImage = (time.time()-start) / count
-      print("{}".format(meanTimePerImage))
-      print("{}".format(1/meanTimePerImage))
-      if format == 0:
-          bayer_img = np.frombuffer(imgStream, dtype=np.uint8)   
-          bayer_img.shape = (244, 324)
-          color_img = cv2.cvtColor(bayer_img, cv2.COLOR_BayerBG2BGRA)
-          cv2.imshow('Raw', bayer_img)
-          cv2.imshow('Color', color_img)
-          if args.save:
-              cv2.imwrite(f"./images/{count}.png", bayer_img)
-          cv2.waitKey(1)
-      else:
-          with open("img.jpeg", "wb") as f:
-              f.write(imgStream)
-          nparr = np.frombuffer(imgStream, np.uint8)
-          decoded = cv2.imdecode(nparr,cv2.IMREAD_UNCHANGED)
-          cv2.imshow('JPEG', decoded)
-          cv2.waitKey(1)
+    count = count + 1
+    meanTimePerImage = (time.time()-start) / count
+    print("{}".format(meanTimePerImage))
+    print("{}".format(1/meanTimePerImage))
+    if format == 0:
+        bayer_img = imgStream
+        color_img = aideck.decode_frame(imgStream, format, 'color')
+        cv2.imshow('Raw', bayer_img)
+        cv2.imshow('Color', color_img)
+        if args.save:
+            cv2.imwrite(f"./images/{count}.png", bayer_img)
+        cv2.waitKey(1)
+    else:
+        decoded = aideck.decode_frame(imgStream, format)
+        cv2.imshow('JPEG', decoded)
+        cv2.waitKey(1)
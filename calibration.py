@@ -0,0 +1,115 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import hashlib
+from pathlib import Path
+import numpy as np
+import yaml
+
+# root directory of repo, calibration files are found independent of the working directory
+ROOT = Path(__file__).parent.absolute()
+
+# camera and resolution of the AI deck (HIMAX HM01B0)
+DEFAULT_CAMERA = 'aideck'
+DEFAULT_RESOLUTION = (324, 244)
+
+# yaml source of every calibration by (camera id, resolution (width, height))
+CALIBRATIONS = {
+    (DEFAULT_CAMERA, DEFAULT_RESOLUTION): ROOT.joinpath("calibrate_camera", "calibration.yaml"),
+}
+
+# directory of the binary calibration cache
+CACHE_DIR = ROOT.joinpath("calibrate_camera", "cache")
+
+# calibrations that were already loaded in this process by (camera id, resolution)
+_LOADED = {}
+
+
+def register_calibration(camera_id, resolution, source):
+    """
+    registers the yaml source of a calibration (e.g., a second camera or resolution)
+    :param camera_id: id of the camera
+    :param resolution: image size (width, height) of the calibration
+    :param source: path of the yaml file with camera_matrix and dist_coeff
+    :return: -
+    """
+    key = (camera_id, tuple(resolution))
+    CALIBRATIONS[key] = Path(source)
+    _LOADED.pop(key, None)
+
+
+def cache_path(camera_id, resolution):
+    """
+    :param camera_id: id of the camera
+    :param resolution: image size (width, height) of the calibration
+    :return: Path: path
+             path of the binary cache file of a calibration
+    """
+    return CACHE_DIR.joinpath("{}_{}x{}.npz".format(camera_id, *resolution))
+
+
+def _parse_yaml(content):
+    """
+    parses a calibration yaml file (slow path, PyYAML)
+    :param content: content of the yaml file
+    :return: double array[[]]: matrix,
+             double array[[]]: distortion
+    """
+    loaded_dict = yaml.safe_load(content)
+    matrix = np.array(loaded_dict.get('camera_matrix'), dtype=float)
+    distortion = np.array(loaded_dict.get('dist_coeff'), dtype=float)
+    return matrix, distortion
+
+
+def load_calibration(camera_id=DEFAULT_CAMERA, resolution=DEFAULT_RESOLUTION):
+    """
+    loads the calibration of a camera
+
+    The calibration is read from the binary cache (.npz) if the cache was created from the current
+    content of the yaml source (sha1 of the file). Otherwise, the yaml file is parsed and the cache
+    is rewritten, so a new calibration.yaml is picked up automatically.
+    :param camera_id: id of the camera
+    :param resolution: image size (width, height) of the calibration
+    :return: double array[[]]: matrix,
+             double array[[]]: distortion
+             camera calibration matrix and distortion coefficients
+    """
+    key = (camera_id, tuple(resolution))
+    if key not in CALIBRATIONS:
+        raise KeyError("no calibration registered for camera {} with resolution {}".format(camera_id, resolution))
+
+    content = CALIBRATIONS[key].read_bytes()
+    source_hash = hashlib.sha1(content).hexdigest()
+
+    # already loaded in this process
+    if key in _LOADED and _LOADED[key][0] == source_hash:
+        return _LOADED[key][1].copy(), _LOADED[key][2].copy()
+
+    path = cache_path(*key)
+    matrix = distortion = None
+    try:
+        with np.load(path) as cache:
+            record = cache['calibration'][()]
+        if record['source_hash'].decode() == source_hash:
+            matrix, distortion = record['camera_matrix'], record['dist_coeff']
+    except (OSError, KeyError, ValueError):
+        pass  # no or broken cache --> parse the yaml file
+
+    if matrix is None:
+        matrix, distortion = _parse_yaml(content)
+        # one record per file, every array of a .npz is a zip member and costs a separate read
+        record = np.array((source_hash, matrix, distortion), dtype=[('source_hash', 'S40'),
+                                                                    ('camera_matrix', float, matrix.shape),
+                                                                    ('dist_coeff', float, distortion.shape)])
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                np.savez(f, calibration=record)
+        except OSError:
+            pass  # read-only checkout, the calibration is still valid
+
+    _LOADED[key] = (source_hash, matrix, distortion)
+    return matrix.copy(), distortion.copy()
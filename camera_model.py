@@ -0,0 +1,88 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import cv2
+import numpy as np
+
+# camera models that were already created, see get_camera_model()
+_CAMERA_MODELS = {}
+
+
+class CameraModel:
+    """
+    class for the calibrated camera of the AI deck
+
+    The optimal new camera matrix and the remap tables of the undistortion are computed once for
+    a calibration and image size. Rectified images and undistorted points belong to the ideal
+    camera 'new_matrix' without distortion, so pose estimation on them is done with
+    (new_matrix, rectified_distortion) and OpenCV does not undistort the points on every solve.
+    """
+
+    def __init__(self, matrix, distortion, size, alpha=0):
+        """
+        constructor for a camera model
+        :param matrix: camera calibration matrix
+        :param distortion: camera calibration distortion coefficients
+        :param size: image size (width, height)
+        :param alpha: scaling of the rectified image (0 --> only valid pixels, 1 --> all pixels of the image)
+        """
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.distortion = np.asarray(distortion, dtype=float)
+        self.size = tuple(size)
+        self.new_matrix, self.roi = cv2.getOptimalNewCameraMatrix(self.matrix, self.distortion, self.size, alpha,
+                                                                  self.size)
+        self.rectified_distortion = np.zeros(5)
+        self.map1, self.map2 = cv2.initUndistortRectifyMap(self.matrix, self.distortion, None, self.new_matrix,
+                                                           self.size, cv2.CV_16SC2)
+
+    def rectify(self, img):
+        """
+        removes the lens distortion of an image with the precomputed remap tables
+        :param img: image of the camera (size of the camera model)
+        :return: image: img,
+                 rectified image
+        """
+        return cv2.remap(img, self.map1, self.map2, cv2.INTER_LINEAR)
+
+    def undistort_points(self, points):
+        """
+        maps points of the camera image to the rectified image
+        :param points: pixel coordinates (any shape with 2 values per point)
+        :return: double array[]: points
+                 undistorted pixel coordinates, same shape as the input
+        """
+        points = np.asarray(points, dtype=np.float32)
+        undistorted = cv2.undistortPoints(points.reshape(-1, 1, 2), self.matrix, self.distortion,
+                                          P=self.new_matrix)
+        return undistorted.reshape(points.shape)
+
+    def undistort_corners(self, corners):
+        """
+        maps the corners of detected markers to the rectified image, all markers at once
+        :param corners: corner coordinates of the markers (as returned by detect_marker())
+        :return: tuple: corners
+                 undistorted corner coordinates in the same format
+        """
+        if len(corners) == 0:
+            return corners
+        points = self.undistort_points(np.concatenate(corners))
+        return tuple(points.reshape(-1, 1, 4, 2))
+
+
+def get_camera_model(matrix, distortion, size, alpha=0):
+    """
+    returns the camera model of a calibration and image size (created once)
+    :param matrix: camera calibration matrix
+    :param distortion: camera calibration distortion coefficients
+    :param size: image size (width, height)
+    :param alpha: scaling of the rectified image, see CameraModel
+    :return: CameraModel: camera
+    """
+    key = (np.asarray(matrix, dtype=float).tobytes(), np.asarray(distortion, dtype=float).tobytes(),
+           tuple(size), alpha)
+    if key not in _CAMERA_MODELS:
+        _CAMERA_MODELS[key] = CameraModel(matrix, distortion, size, alpha)
+    return _CAMERA_MODELS[key]
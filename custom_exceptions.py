@@ -31,3 +31,10 @@ class BatteryException(Exception):
         """
         self.battery_level = battery_level
         self.cf_takeoff = cf_takeoff
+
+
+class TelemetryException(Exception):
+    """
+    Raised when no telemetry is received from the crazyflie
+    """
+    pass
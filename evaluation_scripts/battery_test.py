@@ -9,18 +9,13 @@ import math
 import time
 import argparse
 import yaml
-import socket
-import struct
 import numpy as np
-import threading
 import datetime
 
 # import cf functions
 import cflib.crtp
 from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
-from cflib.crazyflie.syncLogger import SyncLogger
-from cflib.crazyflie.log import LogConfig
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
 
@@ -30,6 +25,16 @@ import cv2
 # import square planar marker functions
 import square_planar_marker as spm
 
+# import camera calibration
+from calibration import load_calibration
+
+# import AI deck streaming functions
+import aideck_stream as aideck
+from aideck_async import AsyncStreamClient
+
+# import telemetry functions
+from telemetry import TelemetrySubscriber
+
 # import custom exceptions
 import custom_exceptions as exceptions
 
@@ -52,87 +57,6 @@ MAX_MARKER_ID = 0
 DISTANCE = np.array([0, 0, 100])  # [cm]
 
 
-def get_cf_data(scf):
-    """
-    fetches logging information from the crazyflie
-    :param scf: id of SyncCrazyflie
-    :return: double: v_bat,
-             double: yaw,
-             double: pitch,
-             double: roll,
-             battery level and current yaw, pitch, roll values
-    """
-
-    # fetch parameter data from cf and extract information
-    with SyncLogger(scf, log_stabilizer) as logger:
-        # logger.connect()
-        for entry in logger:
-            log_data = entry[1]
-            vbat = log_data.get('pm.vbat')
-            yaw = log_data.get('stabilizer.yaw')
-            pitch = log_data.get('stabilizer.pitch')
-            roll = log_data.get('stabilizer.roll')
-            time.sleep(0.02)
-            return vbat, yaw, pitch, roll
-
-
-def rx_bytes(size):
-    """
-    fetches data from the AI deck over wi-fi
-    :param size: size of data segment to fetch
-    :return: bytearray: data
-             the received data in a bytearray
-    """
-
-    rx_data = bytearray()
-    while len(rx_data) < size:
-        rx_data.extend(client_socket.recv(size - len(rx_data)))
-    return rx_data
-
-
-def get_image_from_ai_deck():
-    """
-    function to fetch image from the AI deck
-    :return: -
-             saves the captured image in the global variable 'image'
-    """
-    # Get the info
-    while True:
-        global image
-        global stop_thread_flag
-        if stop_thread_flag:
-            break
-        packet_info_raw = rx_bytes(4)
-        [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, _, _, _, image_format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            if image_format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in this path
-                with open("../wifi_streaming/imgBuffer/img.jpeg", "wb") as im:
-                    im.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
-
-            # set global variable
-            image = img_gray
-
-
 class MovingAverageFilter:
     """
     class for moving average filter for trajectory paths
@@ -210,10 +134,17 @@ class CF:
         :param scf: id of SyncCrazyflie
         """
 
+        # telemetry is streamed for the whole connection, the latest values are read from its snapshot
+        self.telemetry = TelemetrySubscriber(scf)
+        self.telemetry.start()
+        self.telemetry.wait_for_sample(timeout=5)
+
         # psi --> yaw
         # theta --> pitch
         # phi --> roll
-        self.v_bat, self.psi, self.theta, self.phi = get_cf_data(scf)
+        self.v_bat, self.psi, self.theta, self.phi = None, None, None, None
+        if self.telemetry.snapshot() is not None:
+            _, self.v_bat, self.psi, self.theta, self.phi = self.telemetry.snapshot()
         self.scf = scf
         self.mc = MotionCommander(scf)
 
@@ -246,9 +177,8 @@ class CF:
                  battery voltage in V
         """
 
-        # check current battery voltage of cf
-        voltage, _, _, _ = get_cf_data(self.scf)
-        time.sleep(0.02)
+        # check current battery voltage of cf (latest sample of the telemetry stream)
+        _, voltage, _, _, _ = self.telemetry.snapshot()
         self.v_bat = voltage
         return voltage
 
@@ -338,29 +268,21 @@ if __name__ == "__main__":
     deck_port = args.p
     deck_ip = args.n
 
-    # connect the AI deck
+    # connect the AI deck, the images are received by the asyncio streaming client
     print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((deck_ip, deck_port))
-    print("Socket connected")
+    frame_mailbox = aideck.FrameMailbox()
+    stream_client = AsyncStreamClient(deck_ip, deck_port, frame_mailbox)
+    stream_client.start()
+    if stream_client.wait_connected(timeout=5):
+        print("Socket connected")
 
     # load calibration-data of camera
-    with open('../calibrate_camera/calibration.yaml') as f:
-        loaded_dict = yaml.safe_load(f)
-        mtx = loaded_dict.get('camera_matrix')
-        dis = loaded_dict.get('dist_coeff')
-        matrix = np.array(mtx)
-        distortion = np.array(dis)
+    matrix, distortion = load_calibration()
     print("Camera calibration loaded")
     marker_size = 20  # size in cm
 
     # setup for logging
     logging.basicConfig(level=logging.ERROR)
-    log_stabilizer = LogConfig(name="Stabilizer", period_in_ms=12)
-    log_stabilizer.add_variable('pm.vbat', 'float')
-    log_stabilizer.add_variable('stabilizer.yaw', 'float')
-    log_stabilizer.add_variable('stabilizer.pitch', 'float')
-    log_stabilizer.add_variable('stabilizer.roll', 'float')
 
     # initiate low level drivers
     cflib.crtp.init_drivers(enable_debug_driver=False)
@@ -378,6 +300,8 @@ if __name__ == "__main__":
     with SyncCrazyflie(URI, cf) as sync_cf:
         try:
             crazyflie = CF(sync_cf)
+            if crazyflie.telemetry.snapshot() is None:
+                raise exceptions.TelemetryException
             print("crazyflie initialized!")
 
             # check if extensions decks are connected
@@ -393,23 +317,15 @@ if __name__ == "__main__":
 
             print("Battery-level OK [Voltage = " + str(round(v_bat, 2)) + "V]")
 
-            # initialize global variable for image
-            image = None
-            # initialize flag to stop the image-thread
-            stop_thread_flag = False
-            # start thread for image acquisition
-            t1 = threading.Thread(target=get_image_from_ai_deck)
-            t1.start()
-            time.sleep(1)
-
             c = 0  # counter for image waiting
+            image, _, _ = frame_mailbox.wait_for_newer(0, timeout=1)
             while image is None:
                 print("Wait for image!")
-                time.sleep(2)
+                image, _, _ = frame_mailbox.wait_for_newer(0, timeout=2)
                 c += 1
                 if c > 3:  # if image can not be detected more than 3 times --> raise exception
                     raise exceptions.ImageFetchException
-            print("Image Thread started")
+            print("Image stream started")
 
             # All checks done
 
@@ -444,6 +360,7 @@ if __name__ == "__main__":
                 marker_found = False
                 while not marker_found and elapsed_time < 10:
                     print("Search for marker with id=" + str(m))
+                    image = frame_mailbox.latest()[0]  # latest received image
                     marker_ids, marker_corners = spm.detect_marker(image)
                     cv2.imshow('spm detection', image)
                     cv2.waitKey(1)
@@ -460,6 +377,7 @@ if __name__ == "__main__":
                 # the marker gets out of the image frame
                 marker_ids = None
                 while marker_ids is None:
+                    image = frame_mailbox.latest()[0]  # latest received image
                     marker_ids, marker_corners = spm.detect_marker(image)
 
                 # now perform control-loop for marker with id == m
@@ -478,6 +396,7 @@ if __name__ == "__main__":
                         # control loop -- approach marker until distance to goal is > 5cm
                         start_time = time.time()
                         while v_bat > LOW_BAT:
+                            image = frame_mailbox.latest()[0]  # latest received image
                             marker_ids, marker_corners = spm.detect_marker(image)  # detect markers in image
                             if marker_ids is not None:  # if there is a marker
                                 for d, j in enumerate(
@@ -546,6 +465,9 @@ if __name__ == "__main__":
         except exceptions.DeckException:
             print("Error: At least one deck not detected")
 
+        except exceptions.TelemetryException:
+            print("Error: No telemetry received from crazyflie")
+
         except exceptions.ImageFetchException:
             print("Error: Image can not be fetched from AI deck")
 
@@ -554,28 +476,22 @@ if __name__ == "__main__":
             if e.cf_takeoff:  # if crazyflie already took off --> land
                 print("----> crazyflie is landing")
                 crazyflie.land()  # land
-                stop_thread_flag = True  # terminate image thread
-                t1.join()  # join image thread
+                stream_client.stop()  # terminate image stream
                 time.sleep(2)  # wait
-                client_socket.close()  # close WiFi socket
 
         except KeyboardInterrupt:
             print("Error: Application was stopped!")
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
 
         finally:
             # when all markers are processed --> land
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
 
 
 
@@ -9,18 +9,13 @@ import math
 import time
 import argparse
 import yaml
-import socket
-import struct
 import numpy as np
-import threading
 import datetime
 
 # import cf functions
 import cflib.crtp
 from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
-from cflib.crazyflie.syncLogger import SyncLogger
-from cflib.crazyflie.log import LogConfig
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
 
@@ -30,6 +25,16 @@ import cv2
 # import square planar marker functions
 import square_planar_marker as spm
 
+# import camera calibration
+from calibration import load_calibration
+
+# import AI deck streaming functions
+import aideck_stream as aideck
+from aideck_async import AsyncStreamClient
+
+# import telemetry functions
+from telemetry import TelemetrySubscriber
+
 # import custom exceptions
 import custom_exceptions as exceptions
 
@@ -52,92 +57,26 @@ MAX_MARKER_ID = 0
 DISTANCE = np.array([0, 0, 75])  # [cm]
 
 
-def get_cf_data(scf):
+class TimedFrameMailbox(aideck.FrameMailbox):
     """
-    fetches logging information from the crazyflie
-    :param scf: id of SyncCrazyflie
-    :return: double: v_bat,
-             double: yaw,
-             double: pitch,
-             double: roll,
-             battery level and current yaw, pitch, roll values
+    class for a frame mailbox that also keeps the time between the last two received images (camera time)
     """
 
-    # fetch parameter data from cf and extract information
-    with SyncLogger(scf, log_stabilizer) as logger:
-        # logger.connect()
-        for entry in logger:
-            log_data = entry[1]
-            vbat = log_data.get('pm.vbat')
-            yaw = log_data.get('stabilizer.yaw')
-            pitch = log_data.get('stabilizer.pitch')
-            roll = log_data.get('stabilizer.roll')
-            time.sleep(0.02)
-            return vbat, yaw, pitch, roll
-
-
-def rx_bytes(size):
-    """
-    fetches data from the AI deck over wi-fi
-    :param size: size of data segment to fetch
-    :return: bytearray: data
-             the received data in a bytearray
-    """
-
-    rx_data = bytearray()
-    while len(rx_data) < size:
-        rx_data.extend(client_socket.recv(size - len(rx_data)))
-    return rx_data
-
+    def __init__(self):
+        """
+        constructor for a timed frame mailbox
+        """
+        super().__init__()
+        self.frame_interval = 0  # time between the last two received images
+        self._last_timestamp = None
 
-def get_image_from_ai_deck():
-    """
-    function to fetch image from the AI deck
-    :return: -
-             saves the captured image in the global variable 'image'
-    """
-    # Get the info
-    while True:
-        global image
-        global stop_thread_flag
-        global temp_timer
-        if stop_thread_flag:
-            break
-        ### start timer
-        timeing_start = time.time()
-
-        packet_info_raw = rx_bytes(4)
-        [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, _, _, _, image_format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            if image_format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in this path
-                with open("../wifi_streaming/imgBuffer/img.jpeg", "wb") as im:
-                    im.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
-
-            # set global variable
-            image = img_gray
-
-            ### save time
-            temp_timer = time.time() - timeing_start
+    def publish(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        if self._last_timestamp is not None:
+            self.frame_interval = timestamp - self._last_timestamp
+        self._last_timestamp = timestamp
+        return super().publish(frame, timestamp)
 
 
 class MovingAverageFilter:
@@ -217,10 +156,17 @@ class CF:
         :param scf: id of SyncCrazyflie
         """
 
+        # telemetry is streamed for the whole connection, the latest values are read from its snapshot
+        self.telemetry = TelemetrySubscriber(scf)
+        self.telemetry.start()
+        self.telemetry.wait_for_sample(timeout=5)
+
         # psi --> yaw
         # theta --> pitch
         # phi --> roll
-        self.v_bat, self.psi, self.theta, self.phi = get_cf_data(scf)
+        self.v_bat, self.psi, self.theta, self.phi = None, None, None, None
+        if self.telemetry.snapshot() is not None:
+            _, self.v_bat, self.psi, self.theta, self.phi = self.telemetry.snapshot()
         self.scf = scf
         self.mc = MotionCommander(scf)
 
@@ -253,9 +199,8 @@ class CF:
                  battery voltage in V
         """
 
-        # check current battery voltage of cf
-        voltage, _, _, _ = get_cf_data(self.scf)
-        time.sleep(0.02)
+        # check current battery voltage of cf (latest sample of the telemetry stream)
+        _, voltage, _, _, _ = self.telemetry.snapshot()
         self.v_bat = voltage
         return voltage
 
@@ -345,29 +290,21 @@ if __name__ == "__main__":
     deck_port = args.p
     deck_ip = args.n
 
-    # connect the AI deck
+    # connect the AI deck, the images are received by the asyncio streaming client
     print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((deck_ip, deck_port))
-    print("Socket connected")
+    frame_mailbox = TimedFrameMailbox()
+    stream_client = AsyncStreamClient(deck_ip, deck_port, frame_mailbox)
+    stream_client.start()
+    if stream_client.wait_connected(timeout=5):
+        print("Socket connected")
 
     # load calibration-data of camera
-    with open('../calibrate_camera/calibration.yaml') as f:
-        loaded_dict = yaml.safe_load(f)
-        mtx = loaded_dict.get('camera_matrix')
-        dis = loaded_dict.get('dist_coeff')
-        matrix = np.array(mtx)
-        distortion = np.array(dis)
+    matrix, distortion = load_calibration()
     print("Camera calibration loaded")
     marker_size = 20  # size in cm
 
     # setup for logging
     logging.basicConfig(level=logging.ERROR)
-    log_stabilizer = LogConfig(name="Stabilizer", period_in_ms=12)
-    log_stabilizer.add_variable('pm.vbat', 'float')
-    log_stabilizer.add_variable('stabilizer.yaw', 'float')
-    log_stabilizer.add_variable('stabilizer.pitch', 'float')
-    log_stabilizer.add_variable('stabilizer.roll', 'float')
 
     # initiate low level drivers
     cflib.crtp.init_drivers(enable_debug_driver=False)
@@ -384,7 +321,6 @@ if __name__ == "__main__":
     calculation_time = []
     exec_time = []
     timer_start = 0
-    temp_timer = 0
 
     # starting the main functionality
 
@@ -392,6 +328,8 @@ if __name__ == "__main__":
     with SyncCrazyflie(URI, cf) as sync_cf:
         try:
             crazyflie = CF(sync_cf)
+            if crazyflie.telemetry.snapshot() is None:
+                raise exceptions.TelemetryException
             print("crazyflie initialized!")
 
             # check if extensions decks are connected
@@ -407,23 +345,15 @@ if __name__ == "__main__":
 
             print("Battery-level OK [Voltage = " + str(round(v_bat, 2)) + "V]")
 
-            # initialize global variable for image
-            image = None
-            # initialize flag to stop the image-thread
-            stop_thread_flag = False
-            # start thread for image acquisition
-            t1 = threading.Thread(target=get_image_from_ai_deck)
-            t1.start()
-            time.sleep(1)
-
             c = 0  # counter for image waiting
+            image, _, _ = frame_mailbox.wait_for_newer(0, timeout=1)
             while image is None:
                 print("Wait for image!")
-                time.sleep(2)
+                image, _, _ = frame_mailbox.wait_for_newer(0, timeout=2)
                 c += 1
                 if c > 3:  # if image can not be detected more than 3 times --> raise exception
                     raise exceptions.ImageFetchException
-            print("Image Thread started")
+            print("Image stream started")
 
             # All checks done
 
@@ -458,6 +388,7 @@ if __name__ == "__main__":
                 marker_found = False
                 while not marker_found and elapsed_time < 10:
                     print("Search for marker with id=" + str(m))
+                    image = frame_mailbox.latest()[0]  # latest received image
                     marker_ids, marker_corners = spm.detect_marker(image)
                     cv2.imshow('spm detection', image)
                     cv2.waitKey(1)
@@ -474,6 +405,7 @@ if __name__ == "__main__":
                 # the marker gets out of the image frame
                 marker_ids = None
                 while marker_ids is None:
+                    image = frame_mailbox.latest()[0]  # latest received image
                     marker_ids, marker_corners = spm.detect_marker(image)
 
                 # now perform control-loop for marker with id == m
@@ -497,9 +429,10 @@ if __name__ == "__main__":
 
                             ### save camera time
                             if filter_count > window_size:
-                                camera_time.append(temp_timer)
+                                camera_time.append(frame_mailbox.frame_interval)
                                 timer_start = time.time()
 
+                            image = frame_mailbox.latest()[0]  # latest received image
                             marker_ids, marker_corners = spm.detect_marker(image)  # detect markers in image
 
                             if marker_ids is not None:  # if there is a marker
@@ -581,6 +514,9 @@ if __name__ == "__main__":
         except exceptions.DeckException:
             print("Error: At least one deck not detected")
 
+        except exceptions.TelemetryException:
+            print("Error: No telemetry received from crazyflie")
+
         except exceptions.ImageFetchException:
             print("Error: Image can not be fetched from AI deck")
 
@@ -589,28 +525,22 @@ if __name__ == "__main__":
             if e.cf_takeoff:  # if crazyflie already took off --> land
                 print("----> crazyflie is landing")
                 crazyflie.land()  # land
-                stop_thread_flag = True  # terminate image thread
-                t1.join()  # join image thread
+                stream_client.stop()  # terminate image stream
                 time.sleep(2)  # wait
-                client_socket.close()  # close WiFi socket
 
         except KeyboardInterrupt:
             print("Error: Application was stopped!")
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
 
         else:
             # when all markers are processed --> land
             print("----> crazyflie is landing")
             crazyflie.land()  # land
-            stop_thread_flag = True  # terminate image thread
-            t1.join()  # join image thread
+            stream_client.stop()  # terminate image stream
             time.sleep(2)  # wait
-            client_socket.close()  # close WiFi socket
 
             data = {'camera': np.asarray(camera_time).tolist(),
                     'detection': np.asarray(detection_time).tolist(),
@@ -632,4 +562,5 @@ if __name__ == "__main__":
             print("Log saved!")
 
         finally:
+            stream_client.stop()  # terminate image stream
             print("Application ended!")
@@ -0,0 +1,159 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import argparse
+import datetime
+import time
+from pathlib import Path
+import numpy as np
+import yaml
+
+import cv2
+import cv2.aruco as aruco
+
+# import square planar marker functions
+import square_planar_marker as spm
+
+
+def load_images(path):
+    """
+    loads all images of the benchmark set
+    :param path: directory with .png/.jpeg/.jpg images
+    :return: dict: images
+             grayscale images by file name
+    """
+    images = {}
+    for fn in sorted(Path(path).iterdir()):
+        if fn.suffix.lower() in ('.png', '.jpeg', '.jpg'):
+            images[fn.name] = cv2.imread(str(fn), cv2.IMREAD_GRAYSCALE)
+    return images
+
+
+def detect(img, dictionary, parameters):
+    """
+    detects the markers of an image
+    :param img: grayscale image
+    :param dictionary: aruco dictionary
+    :param parameters: aruco detector parameters
+    :return: dict: markers
+             corners (4x2 array) by marker id
+    """
+    (corners, ids, rejected) = aruco.detectMarkers(img, dictionary, parameters=parameters)
+    if ids is None:
+        return {}
+    return {int(i): c.reshape(4, 2) for i, c in zip(ids.flatten(), corners)}
+
+
+def benchmark_profile(images, labels, dictionary, parameters, repeat):
+    """
+    scores a detector parameter profile on the labelled image set
+    :param images: grayscale images by file name
+    :param labels: labelled corners by file name and marker id
+    :param dictionary: aruco dictionary
+    :param parameters: aruco detector parameters
+    :param repeat: number of detections per image for the latency measurement
+    :return: dict: result
+             latency [s] (mean, median, p95), recall, false positives and corner error [px]
+    """
+    latency = []
+    found = 0
+    expected = 0
+    false_positives = 0
+    corner_error = []
+    for name, img in images.items():
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            markers = detect(img, dictionary, parameters)
+            latency.append(time.perf_counter() - start_time)
+
+        reference = labels.get(name, {})
+        expected += len(reference)
+        for marker_id, corners in markers.items():
+            if marker_id in reference:
+                found += 1
+                corner_error.append(np.linalg.norm(corners - reference[marker_id], axis=1).mean())
+            else:
+                false_positives += 1
+
+    return {'latency_mean': float(np.mean(latency)),
+            'latency_median': float(np.median(latency)),
+            'latency_p95': float(np.percentile(latency, 95)),
+            'recall': found / expected if expected else 0.0,
+            'false_positives': false_positives,
+            'corner_error': float(np.mean(corner_error)) if corner_error else float('nan')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the detector parameter profiles of square_planar_marker')
+    parser.add_argument("--images", default="../calibrate_camera/images", help="directory with the image set")
+    parser.add_argument("--dictionary", default="DICT_6X6_1000", help="aruco dictionary of the markers in the images")
+    parser.add_argument("--labels", default=None,
+                        help="yaml file with the labelled corners {image: {marker id: [[x, y] * 4]}}; "
+                             "without labels, the detections of the 'precise-align' profile are used as reference")
+    parser.add_argument("--save-labels", default=None, help="save the used reference labels to this yaml file")
+    parser.add_argument("--profiles", nargs='+', default=sorted(spm.PARAMETER_PROFILES), help="profiles to compare")
+    parser.add_argument("--repeat", type=int, default=5, help="detections per image for the latency measurement")
+    args = parser.parse_args()
+
+    ar_dic = aruco.Dictionary_get(getattr(aruco, args.dictionary))
+    image_set = load_images(args.images)
+    print("Loaded " + str(len(image_set)) + " images")
+
+    # load or create the reference labels
+    reference_profile = None
+    if args.labels is not None:
+        with open(args.labels) as f:
+            loaded_dict = yaml.safe_load(f)
+        reference_labels = {name: {int(i): np.array(c, dtype=np.float32) for i, c in markers.items()}
+                            for name, markers in loaded_dict.items()}
+    else:
+        reference_profile = 'precise-align'
+        print("No labels given --> reference detections of profile '" + reference_profile + "'")
+        reference_parameters = spm.get_detector_parameters(reference_profile)
+        reference_labels = {name: detect(img, ar_dic, reference_parameters) for name, img in image_set.items()}
+
+    if args.save_labels is not None:
+        with open(args.save_labels, "w") as f:
+            yaml.dump({name: {i: c.tolist() for i, c in markers.items()} for name, markers in reference_labels.items()},
+                      f)
+
+    results = {}
+    for profile in args.profiles:
+        results[profile] = benchmark_profile(image_set, reference_labels, ar_dic,
+                                             spm.get_detector_parameters(profile), args.repeat)
+
+    # the reference profile is scored against its own detections, only its latency can be compared
+    if reference_profile in results:
+        results[reference_profile].update({'recall': None, 'false_positives': None, 'corner_error': None,
+                                           'reference': True})
+
+    print("{:>14} | {:>10} | {:>10} | {:>10} | {:>7} | {:>6} | {:>10}".format(
+        "profile", "mean [ms]", "median [ms]", "p95 [ms]", "recall", "FP", "error [px]"))
+    for profile, r in results.items():
+        if profile == reference_profile:
+            continue
+        print("{:>14} | {:>10.3f} | {:>11.3f} | {:>10.3f} | {:>7.3f} | {:>6d} | {:>10.3f}".format(
+            profile, r['latency_mean'] * 1000, r['latency_median'] * 1000, r['latency_p95'] * 1000,
+            r['recall'], r['false_positives'], r['corner_error']))
+    if reference_profile in results:
+        r = results[reference_profile]
+        print("{:>14} | {:>10.3f} | {:>11.3f} | {:>10.3f} | {:>7} | {:>6} | {:>10}".format(
+            reference_profile + "*", r['latency_mean'] * 1000, r['latency_median'] * 1000, r['latency_p95'] * 1000,
+            "-", "-", "-"))
+        print("* reference without labels: its recall, false positives and corner error would be measured against "
+              "its own detections (self-referential), only its latency is compared")
+
+    t = datetime.datetime.now()
+    filename = "Log_detectorProfiles_" + str(t.year) + "-" + str(t.month) + "-" + str(t.day) + "T" + str(t.hour) + \
+               "-" + str(t.minute) + "-" + str(t.second)
+
+    path = "../plot/timing_data/" + filename + ".yaml"
+    print("Save data...")
+
+    with open(path, "w") as f:
+        yaml.dump(results, f)
+
+    print("Log saved!")
@@ -0,0 +1,193 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import argparse
+import datetime
+import sys
+import time
+import numpy as np
+import yaml
+
+# import square planar marker functions
+import square_planar_marker as spm
+
+# import camera calibration
+from calibration import load_calibration
+from camera_model import get_camera_model
+
+# import telemetry functions
+from telemetry import TelemetryHistory
+
+# import filter functions
+from state_estimation import ESTIMATORS, create_estimator
+
+# import pipeline functions
+from pipeline import Pipeline, marker_stages
+
+# import flight recording functions
+from flight_log import FlightReplay, ReplaySource
+
+# settings of the flight, the replay uses the same perception
+from application import ESTIMATOR, POSE_POLICY, POSE_TIMEOUT
+
+
+def first_marker(replay):
+    """
+    searches the recording for the first detected marker
+    :param replay: FlightReplay of the recording
+    :return: int: marker_id
+             id of the first detected marker, None if no marker was detected
+    """
+    for image, _, _ in replay.frames():
+        marker_ids, _ = spm.detect_marker(image, profile='search')
+        if marker_ids is not None:
+            return int(marker_ids.flatten()[0])
+    return None
+
+
+def telemetry_history(replay):
+    """
+    fills a telemetry history with the recorded telemetry, as it was available during the flight
+    :param replay: FlightReplay of the recording
+    :return: TelemetryHistory: history
+             history of all recorded telemetry samples
+    """
+    history = TelemetryHistory(size=max(1, len(replay.telemetry)))
+    for sample in replay.telemetry:
+        history.append(sample)
+    return history
+
+
+def run_stages(source, stages):
+    """
+    runs the perception stages one after another for every recorded frame, no frame is dropped
+    :param source: ReplaySource of the recording
+    :param stages: list of (name, function) of the stages, see pipeline.marker_stages()
+    :return: list: samples,
+             dict: timings
+             every processed sample of the last stage, list of processing times in seconds by stage name
+    """
+    samples = []
+    timings = {name: [] for name, _ in stages}
+    sample = source.get()
+    while sample is not None:
+        for name, function in stages:
+            start_time = time.perf_counter()
+            sample = function(sample)
+            timings[name].append(time.perf_counter() - start_time)
+            if sample is None:
+                break
+        else:
+            samples.append(sample)
+        sample = source.get()
+    return samples, timings
+
+
+def run_pipeline(source, stages):
+    """
+    runs the perception stages as a pipeline with the timing of the recording, like during the flight
+    (frames are dropped if a stage is too slow)
+    :param source: ReplaySource of the recording (realtime)
+    :param stages: list of (name, function) of the stages, see pipeline.marker_stages()
+    :return: list: samples,
+             dict: timings
+             every sample taken from the pipeline, list of processing times in seconds by stage name
+    """
+    samples = []
+    perception = Pipeline(source, stages)
+    perception.start()
+    while True:
+        sample = perception.get(timeout=POSE_TIMEOUT)
+        if sample is not None:
+            samples.append(sample)
+        elif source.finished:
+            break
+        elif perception.failed_stage() is not None:
+            print("Error: Perception stage '" + perception.failed_stage() + "' failed")
+            break
+    perception.stop()
+    return samples, perception.timings()
+
+
+if __name__ == "__main__":
+    # replays a flight recorded with 'application.py --record-flight' through the perception stages of the approach
+    parser = argparse.ArgumentParser(description='Replay a recorded flight through the perception pipeline')
+    parser.add_argument("recording", help="recording file of application.py --record-flight")
+    parser.add_argument("--marker-id", type=int, default=None, help="marker to follow (default: first detected)")
+    parser.add_argument("--realtime", action='store_true',
+                        help="replay with the timing of the recording through the threaded pipeline "
+                             "(otherwise every frame is processed)")
+    parser.add_argument("--window-size", type=int, default=7, help="window size of the moving average filter")
+    parser.add_argument("--estimator", choices=ESTIMATORS, default=ESTIMATOR,
+                        help="estimator for the pose of the marker")
+    parser.add_argument("--pose-policy", choices=spm.POSE_POLICIES, default=POSE_POLICY,
+                        help="solver policy for the pose of the marker")
+    parser.add_argument('--rectify', action='store_true',
+                        help="Remove the lens distortion of the images before detecting the marker")
+    args = parser.parse_args()
+
+    # load calibration-data of camera
+    matrix, distortion = load_calibration()
+    marker_size = 20  # size in cm
+
+    replay = FlightReplay(args.recording)
+    print("Replaying " + str(len(replay)) + " frames and " + str(len(replay.telemetry)) + " telemetry samples")
+
+    marker_id = args.marker_id if args.marker_id is not None else first_marker(replay)
+    if marker_id is None:
+        print("No marker detected in the recording")
+        sys.exit(1)
+    print("Following marker with id=" + str(marker_id))
+
+    # same perception as the approach of application.py
+    camera = None
+    pose_matrix, pose_distortion = matrix, distortion
+    if args.rectify and len(replay) > 0:
+        image = replay.frame(0)[0]
+        camera = get_camera_model(matrix, distortion, (image.shape[1], image.shape[0]))
+        pose_matrix, pose_distortion = camera.new_matrix, camera.rectified_distortion
+
+    tracker = spm.MarkerTracker(marker_id)
+    solver = spm.PoseSolver(marker_size, pose_matrix, pose_distortion, args.pose_policy)
+    motion_filter = create_estimator(args.estimator, args.window_size, record=True)
+    attitude_data = []  # yaw, pitch, roll of the crazyflie for every measurement
+    stages = marker_stages(tracker, marker_size, matrix, distortion, motion_filter, solver, camera,
+                           telemetry_history(replay), attitude_data)
+
+    source = ReplaySource(replay, realtime=args.realtime)
+    if args.realtime:
+        samples, timings = run_pipeline(source, stages)
+    else:
+        samples, timings = run_stages(source, stages)
+
+    print("Marker found in " + str(len(motion_filter.data_x)) + " of " + str(len(replay)) + " frames, " +
+          str(len(samples)) + " estimates, " + str(tracker.full_frame_searches) + " full frame searches")
+    for name, values in timings.items():
+        if values:
+            print("{:>14}: mean {:.3f}ms | median {:.3f}ms | p95 {:.3f}ms".format(
+                name, np.mean(values) * 1000, np.median(values) * 1000, np.percentile(values, 95) * 1000))
+
+    data = {name: np.asarray(values).tolist() for name, values in timings.items()}
+    data.update({'estimate_t_vec': [np.asarray(sample['linear_motion']).tolist() for sample in samples],
+                 'estimate_psi': [float(sample['yaw_motion']) for sample in samples],
+                 'estimate_timestamp': [float(sample['timestamp']) for sample in samples],
+                 'unfiltered_x': np.asarray(motion_filter.data_x).tolist(),
+                 'unfiltered_y': np.asarray(motion_filter.data_y).tolist(),
+                 'unfiltered_z': np.asarray(motion_filter.data_z).tolist(),
+                 'unfiltered_psi': np.asarray(motion_filter.data_psi).tolist(),
+                 'cf_attitude': attitude_data,
+                 })
+    t = datetime.datetime.now()
+    filename = "Log_replay_" + str(t.year) + "-" + str(t.month) + "-" + str(t.day) + "T" + str(t.hour) + "-" + \
+               str(t.minute) + "-" + str(t.second)
+
+    path = "../plot/timing_data/" + filename + ".yaml"
+    print("Save data...")
+
+    with open(path, "w") as f:
+        yaml.dump(data, f)
+
+    print("Log saved!")
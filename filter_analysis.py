@@ -0,0 +1,141 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import yaml
+
+# signals of the motion logs (plot/filter_data)
+SIGNALS = ('x', 'y', 'z', 'psi')
+
+
+def harmonic_weights(window_size):
+    """
+    weights 1/a of the weighted moving average filter ('1byx'), the newest sample gets the weight 1
+    :param window_size: size of the filter window
+    :return: double array[]: weights
+             weights from the oldest to the newest sample
+    """
+    return 1 / np.arange(window_size, 0, -1)
+
+
+def power_weights(window_size, base=2):
+    """
+    weights base^a, a = -1 ... window_size - 2 (used for the battery data)
+    :param window_size: size of the filter window
+    :param base: base of the weights
+    :return: double array[]: weights
+             weights from the oldest to the newest sample
+    """
+    return float(base) ** np.arange(-1, window_size - 1)
+
+
+def uniform_weights(window_size):
+    """
+    weights of the (unweighted) moving average filter
+    :param window_size: size of the filter window
+    :return: double array[]: weights
+    """
+    return np.ones(window_size)
+
+
+# weight schemes by name
+WEIGHT_SCHEMES = {'uniform': uniform_weights, '1byx': harmonic_weights, 'pow2': power_weights}
+
+
+def moving_average(data, window_size, weights=None):
+    """
+    computes the (weighted) moving average of one or several signals,
+    every output sample is the average of a full window (same as np.average over data[i:i + window_size])
+    :param data: signal (1D) or signals (2D, one signal per row)
+    :param window_size: size of the filter window
+    :param weights: weights from the oldest to the newest sample of a window, None --> uniform weights
+    :return: double array[]: filtered
+             filtered signal(s), len(signal) - window_size + 1 samples per signal
+    """
+    data = np.asarray(data, dtype=float)
+    if weights is None:
+        weights = uniform_weights(window_size)
+    weights = np.asarray(weights, dtype=float)
+    if data.shape[-1] < window_size:
+        return np.zeros(data.shape[:-1] + (0,))
+
+    # all windows as a view of the data, one matrix product for all windows of all signals
+    windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=-1)
+    return windows @ (weights / weights.sum())
+
+
+def analyse_log(signals, window_size, weights=None):
+    """
+    computes the moving average and the weighted moving average of all signals of a motion log
+    :param signals: dict of signal name --> unfiltered samples (all signals have the same length)
+    :param window_size: size of the filter window
+    :param weights: weights of the weighted moving average, None --> harmonic_weights()
+    :return: dict: data
+             'unfiltered_<name>', 'filtered_<name>' and 'w_filtered_<name>' as lists (format of plot/filter_data)
+    """
+    if weights is None:
+        weights = harmonic_weights(window_size)
+    names = list(signals)
+    stacked = np.array([signals[name] for name in names], dtype=float).reshape(len(names), -1)
+
+    filtered = moving_average(stacked, window_size)
+    w_filtered = moving_average(stacked, window_size, weights)
+
+    data = {}
+    for i, name in enumerate(names):
+        data['unfiltered_' + name] = stacked[i].tolist()
+        data['filtered_' + name] = filtered[i].tolist()
+        data['w_filtered_' + name] = w_filtered[i].tolist()
+    return data
+
+
+def window_sweep(signals, window_sizes, scheme='1byx'):
+    """
+    analyses a motion log for several window sizes
+    :param signals: dict of signal name --> unfiltered samples
+    :param window_sizes: window sizes to compare
+    :param scheme: weight scheme of the weighted moving average, see WEIGHT_SCHEMES
+    :return: dict: results
+             analyse_log() result by window size
+    """
+    return {w: analyse_log(signals, w, WEIGHT_SCHEMES[scheme](w)) for w in window_sizes}
+
+
+if __name__ == "__main__":
+    # e.g., python filter_analysis.py plot/filter_data/Log_2023-7-11T13-41-18.yaml --windows 3 5 7 9
+    parser = argparse.ArgumentParser(description='Compare moving average filters on a recorded motion log')
+    parser.add_argument("log", help="motion log with unfiltered_x/y/z/psi (plot/filter_data)")
+    parser.add_argument("--windows", type=int, nargs='+', default=[3, 5, 7, 9], help="window sizes to compare")
+    parser.add_argument("--weights", choices=sorted(WEIGHT_SCHEMES), default='1byx',
+                        help="weights of the weighted moving average")
+    parser.add_argument("--output-dir", default=None,
+                        help="save the filtered log of every window size as <weights>_<window>.yaml to this directory")
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        loaded_dict = yaml.safe_load(f)
+    motion_signals = {name: loaded_dict.get('unfiltered_' + name) for name in SIGNALS}
+
+    start_time = time.perf_counter()
+    results = window_sweep(motion_signals, args.windows, args.weights)
+    print("Analysed {} samples for {} window sizes in {:.2f}ms".format(
+        len(motion_signals['x']), len(args.windows), (time.perf_counter() - start_time) * 1000))
+
+    for window, data in results.items():
+        # deviation of the filtered from the measured signal (same alignment as the filter: end of the window)
+        deviation = [np.std(np.asarray(data['unfiltered_' + name][window - 1:]) -
+                            np.asarray(data['w_filtered_' + name])) for name in SIGNALS]
+        print("window {:>2}: std(measured - filtered) x {:.3f} | y {:.3f} | z {:.3f} | psi {:.4f}".format(
+            window, *deviation))
+
+        if args.output_dir is not None:
+            path = Path(args.output_dir).joinpath(args.weights + "_" + str(window) + ".yaml")
+            with open(path, "w") as f:
+                yaml.dump(data, f)
+            print("Saved " + str(path))
@@ -0,0 +1,276 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import numpy as np
+
+# every record starts with: record type, sequence number, timestamp
+RECORD = struct.Struct('<BId')
+# a frame record continues with: height, width, size, followed by the pixels
+FRAME = struct.Struct('<HHI')
+# a telemetry record continues with: v_bat, yaw, pitch, roll
+TELEMETRY = struct.Struct('<4d')
+
+FRAME_RECORD = 0
+TELEMETRY_RECORD = 1
+
+
+class FlightRecorder:
+    """
+    class for recording the images and the telemetry of a flight to a binary file
+
+    The recorder takes every new image from a frame mailbox on its own thread and writes it
+    together with its sequence number and receive timestamp. Telemetry samples are queued by
+    record_telemetry() and written by the same thread, so recording never blocks the control loop.
+    """
+
+    def __init__(self, path, mailbox):
+        """
+        constructor for a flight recorder
+        :param path: path of the recording file
+        :param mailbox: aideck_stream.FrameMailbox that receives the images
+        """
+        self.path = path
+        self.mailbox = mailbox
+        self.frames = 0  # number of recorded frames
+        self.telemetry = 0  # number of recorded telemetry samples
+
+        self._telemetry_queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+
+    def start(self):
+        """
+        opens the recording file and starts the recorder thread
+        :return: -
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "wb")
+        self._thread = threading.Thread(target=self._record, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """
+        stops the recorder thread, the thread closes the recording file after its last write
+        :param timeout: maximum time in seconds to wait for the recorder thread
+        :return: boolean: stopped
+                 True if the thread has terminated (and the file is closed)
+        """
+        if self._thread is None:
+            return True
+        self._stop.set()
+        self._thread.join(timeout)
+        stopped = not self._thread.is_alive()
+        self._thread = None
+        return stopped
+
+    def record_telemetry(self, vbat, yaw, pitch, roll, timestamp=None):
+        """
+        queues a telemetry sample for recording
+        :param vbat: battery voltage
+        :param yaw: yaw angle
+        :param pitch: pitch angle
+        :param roll: roll angle
+        :param timestamp: time of the sample (time.time()), now if not given
+        :return: -
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._telemetry_queue.put((timestamp, vbat, yaw, pitch, roll))
+
+    def _write_telemetry(self):
+        """
+        writes all queued telemetry samples
+        :return: -
+        """
+        while True:
+            try:
+                timestamp, vbat, yaw, pitch, roll = self._telemetry_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._file.write(RECORD.pack(TELEMETRY_RECORD, self.telemetry, timestamp))
+            self._file.write(TELEMETRY.pack(vbat, yaw, pitch, roll))
+            self.telemetry += 1
+
+    def _record(self):
+        """
+        recorder thread, writes new images and queued telemetry samples
+        :return: -
+        """
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                frame, new_seq, timestamp = self.mailbox.wait_for_newer(seq, timeout=0.05)
+                if frame is not None:
+                    seq = new_seq
+                    height, width = frame.shape[:2]
+                    self._file.write(RECORD.pack(FRAME_RECORD, seq, timestamp))
+                    self._file.write(FRAME.pack(height, width, frame.size))
+                    self._file.write(np.ascontiguousarray(frame).data)
+                    self.frames += 1
+                self._write_telemetry()
+            self._write_telemetry()
+        finally:
+            # only this thread writes, so it closes the file, also if stop() gave up waiting
+            self._file.close()
+
+
+class FlightReplay:
+    """
+    class for replaying a recorded flight
+
+    The recording is memory mapped, the replayed images are views into the file. A recording that
+    ends with an incomplete record (e.g., after a crash during the flight) is replayed up to the
+    last complete record.
+    """
+
+    def __init__(self, path):
+        """
+        constructor for a flight replay, indexes all records of the recording
+        :param path: path of the recording file
+        """
+        self.path = path
+        if os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mm = b""  # an empty file can not be memory mapped
+
+        frame_offsets = []
+        frame_shapes = []
+        frame_seqs = []
+        frame_times = []
+        telemetry = []
+
+        offset = 0
+        end = len(self._mm)
+        while offset + RECORD.size <= end:
+            record_type, seq, timestamp = RECORD.unpack_from(self._mm, offset)
+            offset += RECORD.size
+            if record_type == FRAME_RECORD:
+                if offset + FRAME.size > end:
+                    break  # incomplete last record
+                height, width, size = FRAME.unpack_from(self._mm, offset)
+                offset += FRAME.size
+                if offset + size > end:
+                    break  # incomplete last frame
+                frame_offsets.append(offset)
+                frame_shapes.append((height, width, size))
+                frame_seqs.append(seq)
+                frame_times.append(timestamp)
+                offset += size
+            elif record_type == TELEMETRY_RECORD:
+                if offset + TELEMETRY.size > end:
+                    break  # incomplete last record
+                telemetry.append((timestamp,) + TELEMETRY.unpack_from(self._mm, offset))
+                offset += TELEMETRY.size
+            else:
+                break  # corrupted record, the rest of the file can not be indexed
+
+        self._frame_offsets = frame_offsets
+        self._frame_shapes = frame_shapes
+        self.frame_seqs = np.asarray(frame_seqs, dtype=np.int64)
+        self.frame_times = np.asarray(frame_times)
+        # columns: timestamp, v_bat, yaw, pitch, roll
+        self.telemetry = np.asarray(telemetry).reshape(-1, 5)
+
+    def __len__(self):
+        """
+        :return: int: number of recorded frames
+        """
+        return len(self._frame_offsets)
+
+    def frame(self, index):
+        """
+        returns a recorded frame
+        :param index: index of the frame in the recording
+        :return: ndarray: frame,
+                 int: seq,
+                 double: timestamp
+                 the image, its sequence number and receive timestamp
+        """
+        height, width, size = self._frame_shapes[index]
+        frame = np.frombuffer(self._mm, dtype=np.uint8, count=size, offset=self._frame_offsets[index])
+        # grayscale or RAW images have one byte per pixel, color images one per channel
+        channels = size // (height * width)
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        return frame.reshape(shape), int(self.frame_seqs[index]), float(self.frame_times[index])
+
+    def frames(self, realtime=False):
+        """
+        iterates over the recorded frames
+        :param realtime: if True, the frames are returned with the timing of the recording,
+                         otherwise as fast as possible
+        :return: generator of (frame, seq, timestamp)
+        """
+        start = time.time()
+        for index in range(len(self)):
+            if realtime:
+                delay = (self.frame_times[index] - self.frame_times[0]) - (time.time() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.frame(index)
+
+    def telemetry_at(self, timestamp):
+        """
+        returns the last telemetry sample recorded before a timestamp
+        :param timestamp: time of interest (e.g., receive timestamp of a frame)
+        :return: double array[]: sample
+                 [timestamp, v_bat, yaw, pitch, roll], None if there is no earlier sample
+        """
+        index = np.searchsorted(self.telemetry[:, 0], timestamp, side='right') - 1
+        if index < 0:
+            return None
+        return self.telemetry[index]
+
+    def close(self):
+        """
+        closes the recording
+        :return: -
+        """
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+
+class ReplaySource:
+    """
+    class for the acquisition stage of a replayed flight, takes the recorded frames in order
+    (same interface as pipeline.MailboxSource)
+    """
+
+    def __init__(self, replay, realtime=False):
+        """
+        constructor for a replay source
+        :param replay: FlightReplay of the recording
+        :param realtime: if True, the frames are returned with the timing of the recording
+        """
+        self.replay = replay
+        self.seq = 0  # sequence number of the last taken image
+        self.finished = False  # True after the last frame was taken
+        self._frames = replay.frames(realtime)
+
+    def get(self, timeout=None):
+        """
+        takes the next recorded frame
+        :param timeout: maximum time in seconds to wait if all frames were taken
+        :return: dict: sample
+                 {'image', 'seq', 'timestamp'}, None after the last frame
+        """
+        try:
+            image, seq, timestamp = next(self._frames)
+        except StopIteration:
+            self.finished = True
+            if timeout is not None:
+                time.sleep(timeout)
+            return None
+        self.seq = seq
+        return {'image': image, 'seq': seq, 'timestamp': timestamp}
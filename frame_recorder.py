@@ -0,0 +1,130 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import os
+import queue
+import threading
+import numpy as np
+
+import cv2
+
+import aideck_stream as aideck
+
+
+class FrameRecorder:
+    """
+    class for recording streamed images to disk on a background writer thread
+
+    The receive loop only copies the sampled frame into a bounded queue, the file is written
+    by the writer thread. If the queue is full, a frame is dropped according to the drop policy:
+    'newest' --> the frame that should be recorded is dropped,
+    'oldest' --> the oldest queued frame is dropped to make room for the new one
+    Files are rotated, only the last 'max_files' recorded frames are kept on disk.
+    """
+
+    def __init__(self, directory, every_n=1, max_files=100, queue_size=8, drop_policy='newest'):
+        """
+        constructor for a frame recorder
+        :param directory: directory in which the images are stored
+        :param every_n: record only every n-th frame
+        :param max_files: number of files after which the oldest file is overwritten
+        :param queue_size: maximum number of frames waiting to be written
+        :param drop_policy: 'newest' or 'oldest', which frame is dropped if the queue is full
+        """
+        if drop_policy not in ('newest', 'oldest'):
+            raise ValueError("drop_policy must be 'newest' or 'oldest'")
+
+        self.directory = directory
+        self.every_n = every_n
+        self.max_files = max_files
+        self.drop_policy = drop_policy
+        self.frame_count = 0  # number of frames passed to the recorder
+        self.written = 0  # number of frames written to disk
+        self.dropped = 0  # number of sampled frames that were dropped
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    def start(self):
+        """
+        starts the writer thread
+        :return: -
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_frames, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """
+        stops the writer thread after the queued frames are written
+        :param timeout: maximum time in seconds to wait for the writer thread
+        :return: -
+        """
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._queue.put(None, timeout=timeout)
+                break
+            except queue.Full:
+                # writer is stuck, discard a queued frame to deliver the stop signal
+                self._discard_oldest()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def record(self, frame, image_format):
+        """
+        passes a frame to the recorder, never blocks
+        :param frame: image data as received from the AI deck (RAW image or JPEG encoded bytes)
+        :param image_format: format of the image, see aideck_stream
+        :return: -
+        """
+        self.frame_count += 1
+        if (self.frame_count - 1) % self.every_n != 0:
+            return
+
+        # copy the frame, because the buffer of the receiver is reused
+        item = (np.array(frame, copy=True), image_format)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.drop_policy == 'newest':
+                self.dropped += 1
+                return
+            self._discard_oldest()
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+
+    def _discard_oldest(self):
+        """
+        removes the oldest frame from the queue
+        :return: -
+        """
+        try:
+            self._queue.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+
+    def _write_frames(self):
+        """
+        writer thread, writes the queued frames to disk
+        :return: -
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, image_format = item
+            index = self.written % self.max_files
+            if image_format == aideck.RAW_ENCODING:
+                cv2.imwrite(os.path.join(self.directory, "img_" + str(index) + ".png"), frame)
+            else:
+                with open(os.path.join(self.directory, "img_" + str(index) + ".jpeg"), "wb") as im:
+                    im.write(frame)
+            self.written += 1
@@ -1,6 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+# import filter analysis functions
+import filter_analysis
+
 # try out moving and weighted moving average
 
 wind_size = 7
@@ -10,26 +13,16 @@ for i in range(100):
         data.append(0)
     else:
         data.append(1)
-result_ma = []
-result_wma = []
-
-length = len(data)
-weights = []
-
-# define weights
-for a in range(wind_size, 0, -1):
-    weights.append(1/a)
+weights = filter_analysis.harmonic_weights(wind_size)
 
 print(weights)
 
-for d in range(length-wind_size):
-    result_ma.append(np.average(data[d:d+wind_size]))
-    result_wma.append(np.average(data[d:d+wind_size], weights=weights))
-
-for i in range(wind_size - 1):
-    result_ma = np.insert(result_ma, 0, result_ma[0])
-    result_wma = np.insert(result_wma, 0, result_wma[0])
+result_ma = filter_analysis.moving_average(data, wind_size)
+result_wma = filter_analysis.moving_average(data, wind_size, weights)
 
+# fill the first window with the first filtered value
+result_ma = np.concatenate((np.full(wind_size - 1, result_ma[0]), result_ma))
+result_wma = np.concatenate((np.full(wind_size - 1, result_wma[0]), result_wma))
 
 
 fig = plt.figure(figsize=(20, 10))
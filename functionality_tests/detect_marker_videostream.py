@@ -1,14 +1,13 @@
 import argparse
 import math
-import socket
-import struct
 import time
 
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import yaml
 import square_planar_marker as spm
+import aideck_stream as aideck
+from calibration import load_calibration
 
 CAMERA_OFFSET = 0
 
@@ -22,27 +21,13 @@ deck_port = args.p
 deck_ip = args.n
 
 print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client_socket.connect((deck_ip, deck_port))
+client_socket = aideck.connect(deck_ip, deck_port)
+frame_receiver = aideck.FrameReceiver(client_socket)
 print("Socket connected")
 
 # load calibration-data for markers
-with open('/Users/florianhuber/Documents/Uni/Bachelor_Thesis/crazyflie_spm-navigation/calibrate_camera/calibration.yaml') as f:
-    loadeddict = yaml.safe_load(f)
-    mtx = loadeddict.get('camera_matrix')
-    dist = loadeddict.get('dist_coeff')
-    matrix = np.array(mtx)
-    distortion = np.array(dist)
-    marker_size = 20  # size in cm
-imgdata = None
-data_buffer = bytearray()
-
-
-def rx_bytes(size):
-    data = bytearray()
-    while len(data) < size:
-        data.extend(client_socket.recv(size - len(data)))
-    return data
+matrix, distortion = load_calibration()
+marker_size = 20  # size in cm
 
 
 def marker_detection(image):  # define aruco dictionary and parameters (parameters are default)
@@ -119,58 +104,34 @@ def main():
     count = 0
 
     while 1:
-        # Get the info
-        packet_info_raw = rx_bytes(4)
-        [length, routing, function] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, dst, src] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            count = count + 1
-            mean_time_per_image = (time.time() - start) / count
-
-            if format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in the path
-                with open("/Users/florianhuber/Documents/Uni/Bachelor_Thesis/crazyflie_spm-navigation/wifi_streaming"
-                          "/imgBuffer/img.jpeg", "wb") as f:
-                    f.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
-
-            # img_color is only used for showing on screen
-            img_color = cv2.cvtColor(img_gray, cv2.COLOR_BayerBG2BGRA)
-
-
-
-            corners, ids = marker_detection(img_gray)
-            if corners is not None:
-                i = 0
-                for c in corners:
-                    #r_vec, t_vec, _ = aruco.estimatePoseSingleMarkers(c, marker_size, matrix, distortion)
-                    trans_vec, rot_vec, euler_angles = spm.estimate_marker_pose(c,
-                                                                                marker_size, matrix,
+        # receive the image with the shared AI deck stream functions
+        img_stream, (_, _, _, image_format, _) = frame_receiver.receive_frame()
+        img_gray = aideck.decode_frame(img_stream, image_format)
+
+        count = count + 1
+        mean_time_per_image = (time.time() - start) / count
+
+        # img_color is only used for showing on screen
+        img_color = cv2.cvtColor(img_gray, cv2.COLOR_BayerBG2BGRA)
+
+
+
+        corners, ids = marker_detection(img_gray)
+        if ids is not None and len(corners) > 0:
+            # estimate the poses of all markers at once
+            trans_vecs, rot_vecs, euler_angles_all = spm.estimate_marker_poses(corners, marker_size, matrix,
                                                                                 distortion)
-                    distance = trans_vec[0, 0, 2] - CAMERA_OFFSET
-                    #img_color = print_markerinfo_on_image(img_color, c[0], distance, ids[i])
-                    img_color = print_markerinfo_on_image_new(img_color, c[0], distance, ids[i], trans_vec, rot_vec, euler_angles )
-                    #cv2.drawFrameAxes(img_color, matrix, distortion, r_vec, t_vec, 5)
-                    i += 1
-            cv2.imshow('spm detection', img_color)
-            cv2.waitKey(1)
+            i = 0
+            for c in corners:
+                #r_vec, t_vec, _ = aruco.estimatePoseSingleMarkers(c, marker_size, matrix, distortion)
+                trans_vec, rot_vec, euler_angles = trans_vecs[i:i + 1], rot_vecs[i:i + 1], euler_angles_all[i]
+                distance = trans_vec[0, 0, 2] - CAMERA_OFFSET
+                #img_color = print_markerinfo_on_image(img_color, c[0], distance, ids[i])
+                img_color = print_markerinfo_on_image_new(img_color, c[0], distance, ids[i], trans_vec, rot_vec, euler_angles )
+                #cv2.drawFrameAxes(img_color, matrix, distortion, r_vec, t_vec, 5)
+                i += 1
+        cv2.imshow('spm detection', img_color)
+        cv2.waitKey(1)
 
 
 
@@ -1,21 +1,19 @@
 import numpy as np
 import cv2
 import cv2.aruco as aruco
-import yaml
-import math
+
+import square_planar_marker as spm
+
+# import camera calibration
+from calibration import load_calibration
 
 MAX_MARKER_ID = 3
 FONT = cv2.FONT_HERSHEY_SIMPLEX
 COLOR = (180, 180, 20)
 
 # load calibration-data of camera
-with open('../calibrate_camera/calibration.yaml') as f:
-    loaded_dict = yaml.safe_load(f)
-    mtx = loaded_dict.get('camera_matrix')
-    dis = loaded_dict.get('dist_coeff')
-    matrix = np.array(mtx)
-    distortion = np.array(dis)
-    marker_size = 20  # size in cm
+matrix, distortion = load_calibration()
+marker_size = 20  # size in cm
 print("Camera calibration loaded")
 
 
@@ -46,43 +44,11 @@ def estimate_marker_pose(corners):
     # estimate translation and rotation vector of marker
     r_vec, t_vec, _ = aruco.estimatePoseSingleMarkers(corners, marker_size, matrix, distortion)
     # transform rotation vector to euler angles
-    eul_angles = transform_r_vec_to_euler_angles(r_vec)
+    eul_angles = spm.transform_r_vec_to_euler_angles(r_vec)
 
     return t_vec, r_vec, eul_angles
 
 
-def transform_r_vec_to_euler_angles(r_vec):
-    """
-    Transforms the rotation vector to the euler angles
-    :param r_vec: rotation vector of the marker
-    :return: euler angles [alpha, beta, gamma]
-             alpha: rotation around the left/right axis
-             beta:  rotation around the up/down axis
-             gamma: rotation around the forward/backward axis
-    """
-    r_matrix, _ = cv2.Rodrigues(r_vec)
-    sy = math.sqrt(r_matrix[0, 0] * r_matrix[0, 0] + r_matrix[1, 0] * r_matrix[1, 0])
-
-    singular = sy < 1e-6
-
-    if not singular:
-        x = math.atan2(r_matrix[2, 1], r_matrix[2, 2])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = math.atan2(r_matrix[1, 0], r_matrix[0, 0])
-    else:
-        x = math.atan2(-r_matrix[1, 2], r_matrix[1, 1])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = 0
-
-    if x <= 0:
-        x += math.pi
-
-    else:
-        x -= math.pi
-
-    return np.array([x, y, z])
-
-
 def print_marker_info_on_image(img, corners, marker_id, mtrx, dist, t_vec, r_vec, eul_angles):
     """
     function to print a rectangle, axis and text to the marker
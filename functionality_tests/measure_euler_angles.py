@@ -1,15 +1,13 @@
 import argparse
-import math
-import socket
-import struct
 import time
 
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import yaml
 
 import square_planar_marker as spm
+import aideck_stream as aideck
+from calibration import load_calibration
 
 CAMERA_OFFSET = 0
 
@@ -23,52 +21,13 @@ deck_port = args.p
 deck_ip = args.n
 
 print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client_socket.connect((deck_ip, deck_port))
+client_socket = aideck.connect(deck_ip, deck_port)
+frame_receiver = aideck.FrameReceiver(client_socket)
 print("Socket connected")
 
 # load calibration-data for markers
-with open(
-        '/Users/florianhuber/Documents/Uni/Bachelor_Thesis/crazyflie_spm-navigation/calibrate_camera/calibration.yaml') as f:
-    loadeddict = yaml.safe_load(f)
-    mtx = loadeddict.get('camera_matrix')
-    dist = loadeddict.get('dist_coeff')
-    matrix = np.array(mtx)
-    distortion = np.array(dist)
-    marker_size = 20  # size in cm
-imgdata = None
-data_buffer = bytearray()
-
-
-def rotation_vector_to_euler_angles(r):
-    r_matrix, _ = cv2.Rodrigues(r)
-    sy = math.sqrt(r_matrix[0, 0] * r_matrix[0, 0] + r_matrix[1, 0] * r_matrix[1, 0])
-
-    singular = sy < 1e-6
-
-    if not singular:
-        x = math.atan2(r_matrix[2, 1], r_matrix[2, 2])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = math.atan2(r_matrix[1, 0], r_matrix[0, 0])
-    else:
-        x = math.atan2(-r_matrix[1, 2], r_matrix[1, 1])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = 0
-
-    if x <= 0:
-        x += math.pi
-
-    else:
-        x -= math.pi
-
-    return np.array([x, y, z])
-
-
-def rx_bytes(size):
-    data = bytearray()
-    while len(data) < size:
-        data.extend(client_socket.recv(size - len(data)))
-    return data
+matrix, distortion = load_calibration()
+marker_size = 20  # size in cm
 
 
 def marker_detection(image):  # define aruco dictionary and parameters (parameters are default)
@@ -95,7 +54,7 @@ def estimate_marker_pose(img, id, corners):
     r_vec, t_vec, _ = aruco.estimatePoseSingleMarkers(corners, marker_size, matrix, distortion)
     # transform rotation vector to rotation matrix
     print(t_vec[0, 0])
-    euler_angles = rotation_vector_to_euler_angles(r_vec)
+    euler_angles = spm.transform_r_vec_to_euler_angles(r_vec)
     # pose_matrix = cv2.hconcat((r_matrix, t_vec))
     # _, _, _, _, _, _, euler_angles = cv2.decomposeProjectionMatrix(pose_matrix)
 
@@ -224,56 +183,33 @@ def main():
     count = 0
 
     while 1:
-        # Get the info
-        packet_info_raw = rx_bytes(4)
-        [length, routing, function] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, dst, src] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            count = count + 1
-            mean_time_per_image = (time.time() - start) / count
-
-            if format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in the path
-                with open("/Users/florianhuber/Documents/Uni/Bachelor_Thesis/crazyflie_spm-navigation/wifi_streaming"
-                          "/imgBuffer/img.jpeg", "wb") as f:
-                    f.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
-
-            # img_color is only used for showing on screen
-            euler = None
+        # receive the image with the shared AI deck stream functions
+        img_stream, (_, _, _, image_format, _) = frame_receiver.receive_frame()
+        img_gray = aideck.decode_frame(img_stream, image_format)
+
+        count = count + 1
+        mean_time_per_image = (time.time() - start) / count
+
+        # img_color is only used for showing on screen
+        euler = None
+        img_color = cv2.cvtColor(img_gray, cv2.COLOR_BayerBG2BGRA)
+        marker_ids = None
+        while marker_ids is None:
+            marker_ids, marker_corners = spm.detect_marker(img_gray)
+            cv2.imshow('spm detection', img_gray)
             img_color = cv2.cvtColor(img_gray, cv2.COLOR_BayerBG2BGRA)
-            marker_ids = None
-            while marker_ids is None:
-                marker_ids, marker_corners = spm.detect_marker(img_gray)
-                cv2.imshow('spm detection', img_gray)
-                img_color = cv2.cvtColor(img_gray, cv2.COLOR_BayerBG2BGRA)
-            for c, i in enumerate(marker_ids):
-                # estimate pose of marker with desired id
-                trans_vec, rot_vec, euler_angles = spm.estimate_marker_pose(marker_corners[c], marker_size,
+        # estimate the poses of all markers at once
+        trans_vecs, rot_vecs, euler_angles_all = spm.estimate_marker_poses(marker_corners, marker_size,
                                                                             matrix, distortion)
-                img_color = spm.print_marker_details(img_color, c, 3, matrix, distortion, trans_vec, rot_vec,
-                                                     euler_angles, 0)
-
-            cv2.imshow('spm detection', img_color)
-            print(euler)
-            cv2.waitKey(1)
+        for c, i in enumerate(marker_ids):
+            # pose of marker with desired id
+            trans_vec, rot_vec, euler_angles = trans_vecs[c:c + 1], rot_vecs[c:c + 1], euler_angles_all[c]
+            img_color = spm.print_marker_details(img_color, c, 3, matrix, distortion, trans_vec, rot_vec,
+                                                 euler_angles, 0)
+
+        cv2.imshow('spm detection', img_color)
+        print(euler)
+        cv2.waitKey(1)
 
 
 if __name__ == "__main__":
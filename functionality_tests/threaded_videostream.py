@@ -4,27 +4,13 @@ import sys
 import time
 import argparse
 import yaml
-import socket
-import struct
-import numpy as np
 import threading
 
 # import open cv functions
 import cv2
 
-
-def rx_bytes(size):
-    """
-    fetches data from the AI deck over wi-fi
-    :param size: size of data segment to fetch
-    :return: bytearray: data
-             the received data in a bytearray
-    """
-
-    data = bytearray()
-    while len(data) < size:
-        data.extend(client_socket.recv(size - len(data)))
-    return data
+# import AI deck streaming functions
+import aideck_stream as aideck
 
 
 def get_image_from_ai_deck():
@@ -39,34 +25,11 @@ def get_image_from_ai_deck():
         global stop_thread_flag
         if stop_thread_flag:
             break
-        packet_info_raw = rx_bytes(4)
-        [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-        img_header = rx_bytes(length - 2)
-        [magic, _, _, _, image_format, size] = struct.unpack('<BHHBBI', img_header)
-        if magic == 0xBC:
-            # Receive the image, this will be split up in packages of some size
-            img_stream = bytearray()
-
-            while len(img_stream) < size:
-                packet_info_raw = rx_bytes(4)
-                [length, _, _] = struct.unpack('<HBB', packet_info_raw)
-                chunk = rx_bytes(length - 2)
-                img_stream.extend(chunk)
-
-            if image_format == 0:
-                # RAW image format streamed
-                img_gray = np.frombuffer(img_stream, dtype=np.uint8)
-                img_gray.shape = (244, 324)
-
-            else:
-                # JPEG encoded image format streamed
-                # stores the image temporary in this path
-                with open("../wifi_streaming/imgBuffer/img.jpeg", "wb") as im:
-                    im.write(img_stream)
-                np_arr = np.frombuffer(img_stream, np.uint8)
-                img_gray = cv2.imdecode(np_arr, cv2.IMREAD_UNCHANGED)
+        # receive the image with the shared AI deck stream functions
+        img_stream, (_, _, _, image_format, _) = frame_receiver.receive_frame()
 
-            image = img_gray
+        # set global variable
+        image = aideck.decode_frame(img_stream, image_format)
 
 
 if __name__ == "__main__":
@@ -80,8 +43,8 @@ if __name__ == "__main__":
 
     # connect the AI deck
     print("Connecting to socket on {}:{}...".format(deck_ip, deck_port))
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((deck_ip, deck_port))
+    client_socket = aideck.connect(deck_ip, deck_port)
+    frame_receiver = aideck.FrameReceiver(client_socket)
     print("Socket connected")
 
     image = None
@@ -0,0 +1,98 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import numpy as np
+
+
+class MovingAverageFilter:
+    """
+    class for moving average filter for trajectory paths
+
+    The last 'wind_size' samples are kept in a ring buffer. The sum of the window is updated with
+    every sample (and recomputed once per window to avoid accumulating rounding errors); the
+    weighted average is a dot product of the window with the weights rotated to the current
+    position of the ring. The full history (data_x, data_y, data_z, data_psi) is only kept if the
+    filter records.
+    """
+
+    def __init__(self, wind_size, record=False):
+        """
+        constructor for a moving average lowpass filter
+        :param wind_size: size of the filter window of the moving average filter
+        :param record: if True, all appended samples are kept in data_x, data_y, data_z and data_psi
+        """
+        self.wind_size = wind_size
+        self.record = record
+        self.data_x = []
+        self.data_y = []
+        self.data_z = []
+        self.data_psi = []
+        self.weights = []
+        self.count = 0  # number of appended samples
+
+        # define weights
+        for a in range(wind_size, 0, -1):
+            self.weights.append(1 / a)
+
+        # ring buffer of the window, columns: t_vec[0], t_vec[1], t_vec[2], psi
+        self._window = np.zeros((wind_size, 4))
+        self._index = 0  # position of the next sample in the ring buffer
+        self._sum = np.zeros(4)
+
+        # weights rotated for every position of the ring buffer, the oldest sample gets the first weight
+        self._rotated_weights = np.array([np.roll(self.weights, i) for i in range(wind_size)])
+
+    def append(self, t_vec, eul_angles):
+        """
+        function for appending the filter data
+        :param t_vec: translation vector marker
+        :param eul_angles: euler angles of the marker
+        :return: -
+        """
+        row = self._window[self._index]  # view of the oldest sample, it is replaced
+        self._sum -= row
+        row[:3] = t_vec[0, 0]
+        row[3] = eul_angles[1]
+        self._sum += row
+        self._index = (self._index + 1) % self.wind_size
+        if self._index == 0:
+            self._sum = self._window.sum(axis=0)
+        self.count += 1
+
+        if self.record:
+            self.data_y.append(t_vec[0, 0, 0])
+            self.data_z.append(t_vec[0, 0, 1])
+            self.data_x.append(t_vec[0, 0, 2])
+            self.data_psi.append(eul_angles[1])
+
+    def get_moving_average(self):
+        """
+        function to get the moving average filtered values
+        :return:    double array[]: t_vec (filtered),
+                    double: psi_angle (filtered yaw angle)
+        """
+
+        average = self._sum / min(self.count, self.wind_size)
+
+        return average[:3].tolist(), average[3]
+
+    def get_weighted_moving_average(self):
+        """
+        function to get the weighted moving average values for linear and unweighted for angular motion
+        :return:    double array[]: t_vec (filtered),
+                    double: psi_angle (filtered yaw angle)
+        """
+
+        if self.count < self.wind_size:
+            # window not filled yet --> weights of the newest samples
+            weights = self.weights[self.wind_size - self.count:]
+            t_vec = np.dot(weights, self._window[:self.count, :3]) / np.sum(weights)
+        else:
+            weights = self._rotated_weights[self._index]
+            t_vec = np.dot(weights, self._window[:, :3]) / np.sum(self.weights)
+        psi = self._sum[3] / min(self.count, self.wind_size)
+
+        return t_vec.tolist(), psi
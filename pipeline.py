@@ -0,0 +1,317 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import collections
+import logging
+import math
+import threading
+import time
+
+# import square planar marker functions
+import square_planar_marker as spm
+
+logger = logging.getLogger(__name__)
+
+# a stage that fails for this many samples in a row is reported as failed by Pipeline.failed_stage()
+MAX_CONSECUTIVE_ERRORS = 10
+
+
+class LatestValueQueue:
+    """
+    class for a bounded queue between two pipeline stages that only keeps the latest value
+
+    A new value replaces a value that was not taken yet, so a slow consumer always works on the
+    newest data and never on a backlog. Replaced values are counted as dropped.
+    """
+
+    def __init__(self):
+        """
+        constructor for a latest-value queue
+        """
+        self._condition = threading.Condition()
+        self._value = None
+        self._full = False
+        self.dropped = 0  # number of values replaced before they were taken
+
+    def put(self, value):
+        """
+        puts a value into the queue, never blocks
+        :param value: the new value
+        :return: -
+        """
+        with self._condition:
+            if self._full:
+                self.dropped += 1
+            self._value = value
+            self._full = True
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        takes the latest value out of the queue
+        :param timeout: maximum time in seconds to wait, None waits forever
+        :return: value
+                 the latest value, None if no value arrived before the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._full, timeout):
+                return None
+            value = self._value
+            self._value = None
+            self._full = False
+            return value
+
+
+class MailboxSource:
+    """
+    class for the acquisition stage, takes every new image out of a frame mailbox
+
+    The images of a RAW stream are views into the frame ring of the receiver, which are only valid
+    for a few frames. If the images are used after the pipeline (e.g., for the preview), the
+    source copies every image when it enters the pipeline.
+    """
+
+    def __init__(self, mailbox, copy=False):
+        """
+        constructor for a mailbox source
+        :param mailbox: aideck_stream.FrameMailbox that receives the images
+        :param copy: if True, every image is copied out of the mailbox
+        """
+        self.mailbox = mailbox
+        self.copy = copy
+        self.seq = 0  # sequence number of the last taken image
+
+    def get(self, timeout=None):
+        """
+        takes the next new image out of the mailbox
+        :param timeout: maximum time in seconds to wait
+        :return: dict: sample
+                 {'image', 'seq', 'timestamp'}, None if no new image arrived before the timeout
+        """
+        image, seq, timestamp = self.mailbox.wait_for_newer(self.seq, timeout)
+        if image is None:
+            return None
+        self.seq = seq
+        if self.copy:
+            image = image.copy()
+        return {'image': image, 'seq': seq, 'timestamp': timestamp}
+
+
+class StageWorker:
+    """
+    class for a pipeline stage running on its own thread
+
+    The worker takes a sample from its input, processes it with the stage function and puts
+    the result into its output. If the stage function returns None, the sample is discarded
+    (e.g., no marker in the image). If the stage function raises, the error is logged and
+    counted and the worker continues with the next sample.
+    """
+
+    def __init__(self, name, function, source, sink, history=1000):
+        """
+        constructor for a stage worker
+        :param name: name of the stage
+        :param function: stage function, takes a sample and returns the processed sample or None
+        :param source: input of the stage, any object with get(timeout)
+        :param sink: output of the stage, LatestValueQueue
+        :param history: number of stored processing times
+        """
+        self.name = name
+        self.function = function
+        self.source = source
+        self.sink = sink
+        self.durations = collections.deque(maxlen=history)  # processing times in seconds
+        self.processed = 0  # number of processed samples
+        self.errors = 0  # number of samples the stage function raised an error for
+        self.consecutive_errors = 0  # number of errors since the last successfully processed sample
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        starts the worker thread
+        :return: -
+        """
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        """
+        stops the worker thread
+        :param timeout: maximum time in seconds to wait for the thread
+        :return: -
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def alive(self):
+        """
+        :return: boolean: alive
+                 True if the worker thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        """
+        worker thread, processes samples until the worker is stopped
+        :return: -
+        """
+        while not self._stop.is_set():
+            sample = self.source.get(timeout=0.1)
+            if sample is None:
+                continue
+            start_time = time.perf_counter()
+            try:
+                result = self.function(sample)
+            except Exception:
+                # keep the stage alive, but do not hide the error
+                self.errors += 1
+                self.consecutive_errors += 1
+                logger.exception("Unexpected error in pipeline stage '%s'", self.name)
+                continue
+            self.durations.append(time.perf_counter() - start_time)
+            self.processed += 1
+            self.consecutive_errors = 0
+            if result is not None:
+                self.sink.put(result)
+
+
+class Pipeline:
+    """
+    class for a pipeline of stages, every stage runs on its own worker
+
+    Stages are connected by latest-value queues, so while one stage processes a sample, the
+    previous stage already works on the next one. The end-to-end rate is limited by the slowest
+    stage and not by the sum of all stages. A stage that died or keeps failing is reported by
+    failed_stage(), so the consumer can stop waiting for samples.
+    """
+
+    def __init__(self, source, stages):
+        """
+        constructor for a pipeline
+        :param source: input of the first stage, any object with get(timeout) (e.g., MailboxSource)
+        :param stages: list of (name, function) of the stages, in processing order
+        """
+        self.workers = []
+        for name, function in stages:
+            sink = LatestValueQueue()
+            self.workers.append(StageWorker(name, function, source, sink))
+            source = sink
+        self.output = source
+
+    def start(self):
+        """
+        starts all stage workers
+        :return: -
+        """
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self, timeout=1):
+        """
+        stops all stage workers
+        :param timeout: maximum time in seconds to wait for a worker
+        :return: -
+        """
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def get(self, timeout=None):
+        """
+        takes the latest sample out of the last stage
+        :param timeout: maximum time in seconds to wait
+        :return: dict: sample
+                 the latest processed sample, None if no sample arrived before the timeout
+        """
+        return self.output.get(timeout)
+
+    def failed_stage(self, max_consecutive_errors=MAX_CONSECUTIVE_ERRORS):
+        """
+        checks if a stage does not produce samples anymore
+        :param max_consecutive_errors: number of errors in a row after which a stage is failed
+        :return: string: name
+                 name of the first dead or failing stage, None if all stages are working
+        """
+        for worker in self.workers:
+            if not worker.alive() or worker.consecutive_errors >= max_consecutive_errors:
+                return worker.name
+        return None
+
+    def timings(self):
+        """
+        returns the processing times of all stages
+        :return: dict: timings
+                 list of processing times in seconds by stage name
+        """
+        return {worker.name: list(worker.durations) for worker in self.workers}
+
+
+def marker_stages(tracker, marker_size, matrix, distortion, estimator, solver=None, camera=None, history=None,
+                  attitude_data=None):
+    """
+    creates the perception stages for approaching a marker: (rectification -->) detection --> pose --> filter
+    :param tracker: square_planar_marker.MarkerTracker of the approached marker
+    :param marker_size: size of the marker
+    :param matrix: camera calibration matrix
+    :param distortion: camera calibration distortion coefficients
+    :param estimator: state_estimation.StateEstimator for the measured poses
+    :param solver: optional square_planar_marker.PoseSolver, estimate_marker_pose() if not given
+                   (must use camera.new_matrix and camera.rectified_distortion if the images are rectified)
+    :param camera: optional camera_model.CameraModel, the images are rectified before the detection
+    :param history: optional telemetry.TelemetryHistory of the crazyflie
+    :param attitude_data: optional list, the attitude [yaw, pitch, roll] of the crazyflie at every pose appended
+                          to the estimator is appended (NaN without telemetry), so the rows match the recorded poses
+    :return: list: stages
+             (name, function) of the stages for Pipeline
+    """
+    if camera is not None:
+        # poses in the rectified image belong to the ideal camera
+        matrix, distortion = camera.new_matrix, camera.rectified_distortion
+
+    def rectification(sample):
+        # remove the lens distortion with the precomputed remap tables
+        sample['image'] = camera.rectify(sample['image'])
+        return sample
+
+    def detection(sample):
+        # detect the approached marker in the image
+        marker_ids, marker_corners = tracker.detect_marker(sample['image'])
+        if marker_ids is None:
+            return None
+        ids = marker_ids.flatten().tolist()
+        if tracker.marker_id not in ids:
+            return None
+        sample['corners'] = marker_corners[ids.index(tracker.marker_id)]
+        return sample
+
+    def pose(sample):
+        # estimate pose of the marker
+        if solver is not None:
+            sample['t_vec'], sample['r_vec'], sample['euler_angles'] = solver.solve(sample['corners'])
+        else:
+            sample['t_vec'], sample['r_vec'], sample['euler_angles'] = spm.estimate_marker_pose(
+                sample['corners'], marker_size, matrix, distortion)
+        return sample
+
+    def filtering(sample):
+        # append measured pose to the estimator, estimates are returned when enough data is available
+        estimator.append(sample['t_vec'], sample['euler_angles'], sample['timestamp'])
+        if attitude_data is not None:
+            # attitude of the crazyflie when the image was received
+            attitude = history.at(sample['timestamp']) if history is not None else None
+            attitude_data.append(attitude[2:].tolist() if attitude is not None else [math.nan] * 3)
+        if not estimator.ready():
+            return None
+        sample['linear_motion'], sample['yaw_motion'] = estimator.get_estimate(sample['timestamp'])
+        return sample
+
+    stages = [('detection', detection), ('pose', pose), ('filter', filtering)]
+    if camera is not None:
+        stages.insert(0, ('rectification', rectification))
+    return stages
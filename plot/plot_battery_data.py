@@ -3,6 +3,9 @@ import yaml
 import numpy as np
 import matplotlib.pyplot as plt
 
+# import filter analysis functions
+import filter_analysis
+
 # read data
 with open("battery_data/Log_2023-7-5T13-40-12withAI.yaml") as f:
     loaded_dict = yaml.safe_load(f)
@@ -22,25 +25,10 @@ with open("battery_data/Log_2023-7-5T14-56-28withAI.yaml") as f:
 
 # averaging --> noise suppression
 window_size = 3
-weights = []
-for a in range(-1, window_size-1):
-    weights.append(2**a)
-
-avg_battery_AI = []
-i = 0
-while i < len(battery_AI) - window_size + 1:
-    # Calculate the moving average of current window
-    window_average_AI = np.average(battery_AI[i:i + window_size], weights=weights)
-    avg_battery_AI.append(window_average_AI)
-    i += 1
-
-avg_battery_noAI = []
-i = 0
-while i < len(battery_noAI) - window_size + 1:
-    # Calculate the moving average of current window
-    window_average_noAI = np.average(battery_noAI[i:i + window_size], weights=weights)
-    avg_battery_noAI.append(window_average_noAI)
-    i += 1
+weights = filter_analysis.power_weights(window_size)
+
+avg_battery_AI = filter_analysis.moving_average(battery_AI, window_size, weights)
+avg_battery_noAI = filter_analysis.moving_average(battery_noAI, window_size, weights)
 
 
 # change to percent
@@ -0,0 +1,129 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import multiprocessing
+import queue
+import time
+
+import cv2
+import numpy as np
+
+# import square planar marker functions
+import square_planar_marker as spm
+
+
+def _show_frames(frames, window_name, matrix, distortion):
+    """
+    preview process, annotates and shows the published frames until None is received
+    :param frames: queue of (image, marker) tuples, see PreviewPublisher.publish()
+    :param window_name: name of the preview window
+    :param matrix: camera calibration matrix (of the published images)
+    :param distortion: camera calibration distortion coefficients (of the published images)
+    :return: -
+    """
+    while True:
+        try:
+            item = frames.get(timeout=0.1)
+        except queue.Empty:
+            cv2.waitKey(1)  # keep the window responsive
+            continue
+        if item is None:
+            break
+        image, marker = item
+        if marker is not None:
+            corners, marker_id, t_vec, r_vec, eul_angles = marker
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            image = spm.print_marker_details(image, corners.reshape(4, 2), marker_id, matrix, distortion,
+                                             t_vec, r_vec, eul_angles, 0)
+        cv2.imshow(window_name, image)
+        cv2.waitKey(1)
+    cv2.destroyWindow(window_name)
+
+
+class PreviewPublisher:
+    """
+    class for showing the processed images out-of-band in a separate process
+
+    The control loop only publishes the image and the pose of the marker, annotating
+    (print_marker_details) and drawing (imshow/waitKey) is done by the preview process, which
+    also owns the GUI event loop. Frames are published at most 'max_rate' times per second and
+    never block: if the preview process has not taken the last frame yet, the new frame is dropped.
+    The preview process is spawned (not forked), the control loop already runs the stream and
+    telemetry threads and a forked child would inherit their locks in whatever state they are.
+    """
+
+    def __init__(self, matrix, distortion, max_rate=10, window_name='spm detection'):
+        """
+        constructor for a preview publisher
+        :param matrix: camera calibration matrix of the published images
+        :param distortion: camera calibration distortion coefficients of the published images
+        :param max_rate: maximum number of published frames per second (> 0)
+        :param window_name: name of the preview window
+        """
+        if max_rate <= 0:
+            raise ValueError("max_rate must be positive, got {}".format(max_rate))
+        self.matrix = matrix
+        self.distortion = distortion
+        self.period = 1 / max_rate
+        self.window_name = window_name
+        self.published = 0  # number of frames passed to the preview process
+        self.dropped = 0  # number of frames dropped because the preview process was busy
+
+        self._last_publish = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._frames = self._context.Queue(maxsize=1)
+        self._process = None
+
+    def start(self):
+        """
+        starts the preview process
+        :return: -
+        """
+        self._process = self._context.Process(target=_show_frames, name="preview", daemon=True,
+                                              args=(self._frames, self.window_name, self.matrix, self.distortion))
+        self._process.start()
+
+    def stop(self, timeout=1):
+        """
+        stops the preview process and closes the window
+        :param timeout: maximum time in seconds to wait for the preview process
+        :return: -
+        """
+        if self._process is None:
+            return
+        try:
+            self._frames.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        # nobody reads the queue anymore (e.g., the preview process failed), do not wait for it at exit
+        self._frames.cancel_join_thread()
+        self._process = None
+
+    def publish(self, image, marker=None):
+        """
+        passes an image to the preview, never blocks
+        :param image: processed image
+        :param marker: optional (corners, marker_id, t_vec, r_vec, eul_angles) of the marker, drawn on the image
+        :return: boolean: published
+                 True if the image was passed to the preview process
+        """
+        now = time.perf_counter()
+        if self._process is None or now - self._last_publish < self.period:
+            return False
+        self._last_publish = now
+        try:
+            # the queue pickles the image later on its feeder thread, but the image may be a view into a
+            # frame slot of the stream that is overwritten a few frames later (see aideck_stream.FrameMailbox)
+            self._frames.put_nowait((np.copy(image), marker))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.published += 1
+        return True
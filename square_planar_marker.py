@@ -6,29 +6,212 @@ Created on  22.12.2022
 
 import cv2.aruco as aruco
 import cv2
+import collections
 import math
+import time
 import numpy as np
 
 # define aruco dictionary and parameters (parameters are default)
 AR_DIC = aruco.Dictionary_get(aruco.DICT_ARUCO_ORIGINAL)
 AR_PAR = aruco.DetectorParameters_create()
 
+# named detector parameter profiles, every entry overrides the default value of aruco.DetectorParameters
+# (compare the profiles with evaluation_scripts/detector_profile_benchmark.py)
+PARAMETER_PROFILES = {'default': {},
+                      'fast-search': {'adaptiveThreshWinSizeMin': 5,
+                                      'adaptiveThreshWinSizeMax': 15,
+                                      'adaptiveThreshWinSizeStep': 10,
+                                      'minMarkerPerimeterRate': 0.05},
+                      'precise-align': {'cornerRefinementMethod': aruco.CORNER_REFINE_SUBPIX,
+                                        'cornerRefinementWinSize': 5,
+                                        'cornerRefinementMaxIterations': 30,
+                                        'cornerRefinementMinAccuracy': 0.05},
+                      'low-light': {'adaptiveThreshWinSizeMin': 3,
+                                    'adaptiveThreshWinSizeMax': 33,
+                                    'adaptiveThreshWinSizeStep': 6,
+                                    'adaptiveThreshConstant': 5,
+                                    'minMarkerPerimeterRate': 0.02,
+                                    'polygonalApproxAccuracyRate': 0.05}}
 
-def detect_marker(img):
+# detector parameters that were already created, see get_detector_parameters()
+_DETECTOR_PARAMETERS = {'default': AR_PAR}
+
+
+def get_detector_parameters(name):
+    """
+    returns the detector parameters of a parameter profile
+    :param name: name of the profile, see PARAMETER_PROFILES
+    :return: aruco.DetectorParameters: parameters
+             the detector parameters (created once per profile)
+    """
+    if name not in _DETECTOR_PARAMETERS:
+        parameters = aruco.DetectorParameters_create()
+        for key, value in PARAMETER_PROFILES[name].items():
+            setattr(parameters, key, value)
+        _DETECTOR_PARAMETERS[name] = parameters
+    return _DETECTOR_PARAMETERS[name]
+
+
+# profiles for detect_marker()
+# scale: the markers are detected on an image downscaled by this factor, the corners are refined at full resolution
+# parameters: name of the detector parameter profile, see PARAMETER_PROFILES
+DETECTION_PROFILES = {'precise': {'scale': 1.0, 'parameters': 'default'},
+                      'search': {'scale': 0.5, 'parameters': 'fast-search'}}
+
+# termination criteria for refining the corners at full resolution
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 0.05)
+
+
+def detect_marker(img, profile='precise'):
     """
     function detects square planar marker from an image
     :param img: image with marker
+    :param profile: speed/accuracy profile, see DETECTION_PROFILES
+                    'precise' --> detection on the full image (alignment)
+                    'search'  --> coarse detection on a downscaled image, corners refined at full resolution
     :return: int array[]: ids,
              double array[[]]: corners
              id and corner coordinates of markers
     """
 
-    # detect aruco markers
-    (corners, ids, rejected) = aruco.detectMarkers(img, AR_DIC, parameters=AR_PAR)
+    scale = DETECTION_PROFILES[profile]['scale']
+    parameters = get_detector_parameters(DETECTION_PROFILES[profile]['parameters'])
+    if scale == 1.0:
+        # detect aruco markers
+        (corners, ids, rejected) = aruco.detectMarkers(img, AR_DIC, parameters=parameters)
+        return ids, corners
+
+    # detect aruco markers on the downscaled image
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    (corners, ids, rejected) = aruco.detectMarkers(small, AR_DIC, parameters=parameters)
+    if ids is None:
+        return ids, corners
+
+    # refine the corners of the candidates at full resolution
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    win = int(round(1 / scale)) + 1
+    points = np.concatenate(corners).reshape(-1, 1, 2) / scale
+    points = cv2.cornerSubPix(gray, points.astype(np.float32), (win, win), (-1, -1), SUBPIX_CRITERIA)
+    corners = tuple(points.reshape(-1, 1, 4, 2))
 
     return ids, corners
 
 
+class MarkerTracker:
+    """
+    class for tracking a marker in a region of interest (ROI)
+
+    The bounding box of the marker in the next image is predicted from its last corners and its
+    motion between the last two images. The marker is only searched inside the padded ROI;
+    if it is not found there, the whole image is searched.
+    """
+
+    def __init__(self, marker_id, padding=0.5, min_size=40):
+        """
+        constructor for a marker tracker
+        :param marker_id: id of the tracked marker
+        :param padding: padding of the ROI relative to the size of the predicted bounding box
+        :param min_size: minimum width and height of the ROI in pixels
+        """
+        self.marker_id = marker_id
+        self.padding = padding
+        self.min_size = min_size
+        self.corners = None  # last corners of the marker (full-frame coordinates)
+        self.velocity = np.zeros((4, 2), dtype=np.float32)  # motion of the corners between the last two images
+        self.roi = None  # last used ROI (x0, y0, x1, y1)
+        self.full_frame_searches = 0  # number of searches over the whole image
+
+    def reset(self):
+        """
+        forgets the tracked marker, the next search is done over the whole image
+        :return: -
+        """
+        self.corners = None
+        self.velocity[:] = 0
+        self.roi = None
+
+    def predict_roi(self, shape):
+        """
+        predicts the region of interest of the marker in the next image
+        :param shape: shape of the image
+        :return: tuple: roi
+                 (x0, y0, x1, y1) of the ROI, None if the marker is not tracked
+        """
+        if self.corners is None:
+            return None
+        predicted = self.corners + self.velocity
+        x_min, y_min = predicted.min(axis=0)
+        x_max, y_max = predicted.max(axis=0)
+        pad_x = max((x_max - x_min) * self.padding, (self.min_size - (x_max - x_min)) / 2)
+        pad_y = max((y_max - y_min) * self.padding, (self.min_size - (y_max - y_min)) / 2)
+        height, width = shape[:2]
+        x0 = int(max(x_min - pad_x, 0))
+        y0 = int(max(y_min - pad_y, 0))
+        x1 = int(min(x_max + pad_x + 1, width))
+        y1 = int(min(y_max + pad_y + 1, height))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        return x0, y0, x1, y1
+
+    def detect_marker(self, img):
+        """
+        detects square planar markers, searches only the ROI of the tracked marker if possible
+        :param img: image with marker
+        :return: int array[]: ids,
+                 double array[[]]: corners
+                 id and corner coordinates (full-frame) of markers, like detect_marker()
+        """
+        ids = None
+        corners = ()
+        self.roi = self.predict_roi(img.shape)
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            ids, corners = detect_marker(img[y0:y1, x0:x1])
+            if ids is not None and self.marker_id in ids:
+                # map the corners back to full-frame coordinates
+                offset = np.array([x0, y0], dtype=np.float32)
+                corners = tuple(c + offset for c in corners)
+            else:
+                ids = None
+
+        if ids is None:
+            # marker lost --> search the whole image
+            self.full_frame_searches += 1
+            ids, corners = detect_marker(img)
+
+        if ids is not None and self.marker_id in ids:
+            new_corners = corners[list(ids.flatten()).index(self.marker_id)][0]
+            if self.corners is not None:
+                self.velocity = new_corners - self.corners
+            self.corners = new_corners
+        else:
+            self.reset()
+
+        return ids, corners
+
+
+def estimate_marker_poses(corners, mark_size, mtrx, dist):
+    """
+    Estimates the poses of all square planar markers of an image at once
+    :param corners: corner coordinates of the markers (as returned by detect_marker())
+    :param mark_size: size of the markers
+    :param mtrx: camera calibration matrix
+    :param dist: camera calibration distortion coefficients
+    :return: double array[[[]]]: t_vecs,
+             double array[[[]]]: r_vecs,
+             double array[[]]: eul_angles,
+             translation and rotation vectors (N x 1 x 3) of the markers + euler angles (N x 3) of the markers
+    """
+
+    # estimate translation and rotation vectors of all markers in one call
+    r_vecs, t_vecs, _ = aruco.estimatePoseSingleMarkers(corners, mark_size, mtrx, dist)
+    t_vecs[:, 0, 2] *= 0.9  # correction -10% (found in experiments)
+    # transform rotation vectors to euler angles
+    eul_angles = transform_r_vecs_to_euler_angles(r_vecs)
+
+    return t_vecs, r_vecs, eul_angles
+
+
 def estimate_marker_pose(corners, mark_size, mtrx, dist):
     """
     Estimates the pose of a square planar marker
@@ -42,13 +225,109 @@ def estimate_marker_pose(corners, mark_size, mtrx, dist):
              translation and rotation vector of the marker + euler angles of the marker
     """
 
-    # estimate translation and rotation vector of marker
-    r_vec, t_vec, _ = aruco.estimatePoseSingleMarkers(corners, mark_size, mtrx, dist)
-    t_vec[0, 0, 2] -= t_vec[0, 0, 2] * 0.1  # correction -10% (found in experiments)
-    # transform rotation vector to euler angles
-    eul_angles = transform_r_vec_to_euler_angles(r_vec)
+    t_vecs, r_vecs, eul_angles = estimate_marker_poses((corners,), mark_size, mtrx, dist)
+
+    return t_vecs, r_vecs, eul_angles[0]
+
 
-    return t_vec, r_vec, eul_angles
+# policies of PoseSolver
+# 'aruco'      --> aruco.estimatePoseSingleMarkers, every image is solved from scratch (like estimate_marker_pose())
+# 'ippe'       --> solvePnP with SOLVEPNP_IPPE_SQUARE (closed-form solution for square markers)
+# 'warm-start' --> iterative solvePnP starting at the pose of the previous image, IPPE if there is none
+POSE_POLICIES = ('aruco', 'ippe', 'warm-start')
+
+
+class PoseSolver:
+    """
+    class for estimating the pose of a continuously tracked marker
+
+    The raw (uncorrected) pose of the last image is kept as starting point for the 'warm-start'
+    policy. If the refined pose reprojects worse than max_error pixels, the image is solved again
+    with IPPE. The time of every solve is stored in durations.
+    """
+
+    def __init__(self, mark_size, mtrx, dist, policy='warm-start', max_error=2.0, history=1000):
+        """
+        constructor for a pose solver
+        :param mark_size: size of the marker
+        :param mtrx: camera calibration matrix
+        :param dist: camera calibration distortion coefficients
+        :param policy: solver policy, see POSE_POLICIES
+        :param max_error: maximum mean reprojection error in pixels of a warm-started pose
+        :param history: number of stored solve times
+        """
+        if policy not in POSE_POLICIES:
+            raise ValueError("unknown pose policy: " + str(policy))
+        self.mark_size = mark_size
+        self.mtrx = mtrx
+        self.dist = dist
+        self.policy = policy
+        self.max_error = max_error
+        self.durations = collections.deque(maxlen=history)  # solve times in seconds
+        self.fallbacks = 0  # number of warm-started solves that were solved again with IPPE
+
+        # corners of the marker in marker coordinates, same order as the detected corners
+        half = mark_size / 2
+        self.object_points = np.array([[-half, half, 0], [half, half, 0], [half, -half, 0], [-half, -half, 0]],
+                                      dtype=np.float32)
+
+        self._r_vec = None  # raw pose of the last image
+        self._t_vec = None
+
+    def reset(self):
+        """
+        forgets the last pose, the next image is solved from scratch
+        :return: -
+        """
+        self._r_vec = None
+        self._t_vec = None
+
+    def _reprojection_error(self, image_points, r_vec, t_vec):
+        """
+        :return: double: error
+                 mean distance in pixels between the detected and the reprojected corners
+        """
+        projected, _ = cv2.projectPoints(self.object_points, r_vec, t_vec, self.mtrx, self.dist)
+        return np.linalg.norm(projected.reshape(4, 2) - image_points, axis=1).mean()
+
+    def solve(self, corners):
+        """
+        estimates the pose of the marker
+        :param corners: corner coordinates of the marker
+        :return: double array[]: t_vec,
+                 double array[]: r_vec,
+                 double array[]: eul_angles,
+                 translation and rotation vector of the marker + euler angles of the marker
+                 (same format as estimate_marker_pose())
+        """
+        start_time = time.perf_counter()
+        image_points = np.asarray(corners, dtype=np.float32).reshape(4, 2)
+
+        if self.policy == 'aruco':
+            r_vecs, t_vecs, _ = aruco.estimatePoseSingleMarkers(corners, self.mark_size, self.mtrx, self.dist)
+            r_vec, t_vec = r_vecs.reshape(3, 1), t_vecs.reshape(3, 1)
+        elif self.policy == 'warm-start' and self._r_vec is not None:
+            _, r_vec, t_vec = cv2.solvePnP(self.object_points, image_points, self.mtrx, self.dist,
+                                           self._r_vec.copy(), self._t_vec.copy(), useExtrinsicGuess=True,
+                                           flags=cv2.SOLVEPNP_ITERATIVE)
+            if self._reprojection_error(image_points, r_vec, t_vec) > self.max_error:
+                # e.g., marker flipped or jumped --> solve from scratch
+                self.fallbacks += 1
+                _, r_vec, t_vec = cv2.solvePnP(self.object_points, image_points, self.mtrx, self.dist,
+                                               flags=cv2.SOLVEPNP_IPPE_SQUARE)
+        else:
+            _, r_vec, t_vec = cv2.solvePnP(self.object_points, image_points, self.mtrx, self.dist,
+                                           flags=cv2.SOLVEPNP_IPPE_SQUARE)
+        self._r_vec, self._t_vec = r_vec, t_vec
+
+        # same format and correction as estimate_marker_pose()
+        r_vec = r_vec.reshape(1, 1, 3)
+        t_vec = t_vec.reshape(1, 1, 3).copy()
+        t_vec[0, 0, 2] *= 0.9  # correction -10% (found in experiments)
+        eul_angles = transform_r_vec_to_euler_angles(r_vec)
+
+        self.durations.append(time.perf_counter() - start_time)
+        return t_vec, r_vec, eul_angles
 
 
 def print_marker_details(img, corners, marker_id, mtrx, dist, t_vec, r_vec, eul_angles, index):
@@ -117,34 +396,57 @@ def print_marker_position(img, corners):
     return img
 
 
-def transform_r_vec_to_euler_angles(r_vec):
+def transform_r_vecs_to_euler_angles(r_vecs):
     """
-    Transforms the rotation vector to the euler angles
-    :param r_vec: rotation vector of the marker
-    :return: double array[]: euler angles,
-             [alpha, beta, gamma]
+    Transforms rotation vectors to euler angles, all rotation vectors at once
+    :param r_vecs: rotation vectors of the markers (any shape with 3 values per vector, e.g., N x 1 x 3)
+    :return: double array[[]]: euler angles,
+             N x [alpha, beta, gamma]
              alpha: rotation around the left/right axis
              beta:  rotation around the up/down axis
              gamma: rotation around the forward/backward axis
     """
-    r_matrix, _ = cv2.Rodrigues(r_vec)
-    sy = math.sqrt(r_matrix[0, 0] * r_matrix[0, 0] + r_matrix[1, 0] * r_matrix[1, 0])
+    r_vecs = np.asarray(r_vecs, dtype=float).reshape(-1, 3)
+
+    # rotation matrices with the Rodrigues formula R = I + sin(theta) * K + (1 - cos(theta)) * K^2,
+    # only the needed elements are computed
+    theta = np.sqrt(np.einsum('ij,ij->i', r_vecs, r_vecs))
+    kx, ky, kz = (r_vecs / np.maximum(theta, 1e-12)[:, None]).T  # rotation axis (any axis for theta = 0)
+    s = np.sin(theta)
+    c = np.cos(theta)
+    v = 1 - c
+    r00 = c + kx * kx * v
+    r10 = kz * s + kx * ky * v
+    r20 = kx * kz * v - ky * s
+    r21 = kx * s + ky * kz * v
+    r22 = c + kz * kz * v
+
+    sy = np.sqrt(r00 * r00 + r10 * r10)
+
+    x = np.arctan2(r21, r22)
+    y = np.arctan2(-r20, sy)
+    z = np.arctan2(r10, r00)
 
     singular = sy < 1e-6
+    if singular.any():
+        r12 = ky * kz * v - kx * s
+        r11 = c + ky * ky * v
+        x[singular] = np.arctan2(-r12[singular], r11[singular])
+        z[singular] = 0
 
-    if not singular:
-        x = math.atan2(r_matrix[2, 1], r_matrix[2, 2])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = math.atan2(r_matrix[1, 0], r_matrix[0, 0])
-    else:
-        x = math.atan2(-r_matrix[1, 2], r_matrix[1, 1])
-        y = math.atan2(-r_matrix[2, 0], sy)
-        z = 0
+    x = np.where(x <= 0, x + math.pi, x - math.pi)
 
-    if x <= 0:
-        x += math.pi
+    return np.stack((x, y, z), axis=1)
 
-    else:
-        x -= math.pi
 
-    return np.array([x, y, z])
+def transform_r_vec_to_euler_angles(r_vec):
+    """
+    Transforms the rotation vector to the euler angles
+    :param r_vec: rotation vector of the marker
+    :return: double array[]: euler angles,
+             [alpha, beta, gamma]
+             alpha: rotation around the left/right axis
+             beta:  rotation around the up/down axis
+             gamma: rotation around the forward/backward axis
+    """
+    return transform_r_vecs_to_euler_angles(r_vec)[0]
@@ -0,0 +1,289 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import abc
+import math
+import threading
+import time
+import numpy as np
+
+# import filter functions
+from motion_filter import MovingAverageFilter
+
+
+def wrap_angle(angle):
+    """
+    wraps an angle to [-pi, pi)
+    :param angle: angle in rad (scalar or array)
+    :return: double: angle
+             wrapped angle
+    """
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class StateEstimator(abc.ABC):
+    """
+    class for estimating the pose of the marker (t_vec[0], t_vec[1], t_vec[2], psi) from the measured poses
+
+    Estimators are interchangeable: poses are appended with append() and the estimate is fetched
+    with get_estimate() once ready() is True. Subclasses implement update(), predict() and clear().
+    Appending and fetching are synchronized, so the estimate can be fetched from another thread.
+    If the estimator records, all measured poses are kept in data_x, data_y, data_z and data_psi.
+    """
+
+    def __init__(self, min_updates, record=False):
+        """
+        constructor for a state estimator
+        :param min_updates: number of poses needed for the first estimate
+        :param record: if True, all appended poses are kept
+        """
+        self.min_updates = min_updates
+        self.record = record
+        self.data_x = []
+        self.data_y = []
+        self.data_z = []
+        self.data_psi = []
+        self.count = 0  # number of poses since the last reset
+        self.timestamp = None  # time of the last pose
+        self._lock = threading.Lock()
+
+    def append(self, t_vec, eul_angles, timestamp=None):
+        """
+        appends a measured pose
+        :param t_vec: translation vector marker
+        :param eul_angles: euler angles of the marker
+        :param timestamp: time of the measurement (time.time(), e.g., receive timestamp of the image), now if not given
+        :return: -
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        measurement = np.array([t_vec[0, 0, 0], t_vec[0, 0, 1], t_vec[0, 0, 2], eul_angles[1]])
+        with self._lock:
+            self.update(measurement, timestamp)
+            self.timestamp = timestamp
+            self.count += 1
+
+        if self.record:
+            self.data_y.append(t_vec[0, 0, 0])
+            self.data_z.append(t_vec[0, 0, 1])
+            self.data_x.append(t_vec[0, 0, 2])
+            self.data_psi.append(eul_angles[1])
+
+    def ready(self):
+        """
+        :return: boolean: ready
+                 True if enough poses were appended for an estimate
+        """
+        return self.count >= self.min_updates
+
+    def get_estimate(self, timestamp=None):
+        """
+        returns the estimated pose of the marker
+        :param timestamp: time of the estimate, the time of the last pose if not given
+                          (estimators with a motion model predict the pose at this time)
+        :return: double array[]: t_vec (estimated),
+                 double: psi_angle (estimated yaw angle)
+        """
+        with self._lock:
+            state = self.predict(self.timestamp if timestamp is None else timestamp)
+        return state[:3].tolist(), state[3]
+
+    def reset(self):
+        """
+        forgets the estimated state, e.g., when a new marker is approached (recorded poses are kept)
+        :return: -
+        """
+        with self._lock:
+            self.count = 0
+            self.timestamp = None
+            self.clear()
+
+    @abc.abstractmethod
+    def update(self, measurement, timestamp):
+        """
+        updates the state with a measured pose, implemented by the subclasses
+        :param measurement: measured pose [t_vec[0], t_vec[1], t_vec[2], psi]
+        :param timestamp: time of the measurement
+        :return: -
+        """
+
+    @abc.abstractmethod
+    def predict(self, timestamp):
+        """
+        predicts the pose at a point in time, implemented by the subclasses
+        :param timestamp: time of the prediction
+        :return: double array[]: state
+                 pose [t_vec[0], t_vec[1], t_vec[2], psi]
+        """
+
+    @abc.abstractmethod
+    def clear(self):
+        """
+        clears the state, implemented by the subclasses
+        :return: -
+        """
+
+
+class MovingAverageEstimator(StateEstimator):
+    """
+    class for the weighted moving average filter as state estimator (no motion model)
+    """
+
+    def __init__(self, window_size, record=False):
+        """
+        constructor for a moving average estimator
+        :param window_size: size of the filter window
+        :param record: if True, all appended poses are kept
+        """
+        # like before: the window must be filled before the first estimate
+        super().__init__(window_size + 1, record)
+        self.window_size = window_size
+        self.filter = MovingAverageFilter(window_size)
+
+    def update(self, measurement, timestamp):
+        self.filter.append(measurement[:3].reshape(1, 1, 3), (0, measurement[3]))
+
+    def predict(self, timestamp):
+        t_vec, psi = self.filter.get_weighted_moving_average()
+        return np.append(t_vec, psi)
+
+    def clear(self):
+        self.filter = MovingAverageFilter(self.window_size)
+
+
+class AlphaBetaFilter(StateEstimator):
+    """
+    class for an alpha-beta filter with a constant velocity model for every coordinate
+
+    Between the poses, the state is extrapolated with the estimated velocity. The residual of a
+    new pose corrects the position by alpha and the velocity by beta / dt.
+    """
+
+    def __init__(self, alpha=0.5, beta=0.1, record=False):
+        """
+        constructor for an alpha-beta filter
+        :param alpha: position gain (0..1)
+        :param beta: velocity gain (0..2, stable for 0 < beta < 4 - 2 * alpha)
+        :param record: if True, all appended poses are kept
+        """
+        super().__init__(2, record)
+        self.alpha = alpha
+        self.beta = beta
+        self.position = np.zeros(4)
+        self.velocity = np.zeros(4)
+
+    def update(self, measurement, timestamp):
+        if self.count == 0:
+            self.position = measurement.copy()
+            self.velocity[:] = 0
+            return
+        dt = max(timestamp - self.timestamp, 1e-3)
+        predicted = self.position + self.velocity * dt
+        residual = measurement - predicted
+        residual[3] = wrap_angle(residual[3])
+        self.position = predicted + self.alpha * residual
+        self.position[3] = wrap_angle(self.position[3])
+        self.velocity += self.beta / dt * residual
+
+    def predict(self, timestamp):
+        state = self.position + self.velocity * (timestamp - self.timestamp)
+        state[3] = wrap_angle(state[3])
+        return state
+
+    def clear(self):
+        self.position[:] = 0
+        self.velocity[:] = 0
+
+
+class ConstantVelocityKalmanFilter(StateEstimator):
+    """
+    class for a Kalman filter with a constant velocity model for every coordinate
+
+    The 4 coordinates (t_vec[0], t_vec[1], t_vec[2], psi) are independent, every coordinate has
+    the state [position, velocity]. All 4 filters are computed at once: the states are a 4x2 array
+    and the covariances a 4x2x2 array. The process noise is white noise acceleration, so irregular
+    time steps between the poses are handled by the model.
+    """
+
+    def __init__(self, process_noise=(400, 400, 400, 0.25), measurement_noise=(4, 4, 25, 0.0025),
+                 initial_velocity_variance=(2500, 2500, 2500, 1), record=False):
+        """
+        constructor for a constant velocity Kalman filter
+        :param process_noise: spectral density of the acceleration of every coordinate ([cm^2/s^3], [rad^2/s^3])
+        :param measurement_noise: variance of the measured poses ([cm^2], [rad^2])
+        :param initial_velocity_variance: variance of the velocity at the first pose ([cm^2/s^2], [rad^2/s^2])
+        :param record: if True, all appended poses are kept
+        """
+        super().__init__(2, record)
+        self.q = np.asarray(process_noise, dtype=float)
+        self.r = np.asarray(measurement_noise, dtype=float)
+        self.initial_velocity_variance = np.asarray(initial_velocity_variance, dtype=float)
+        self.x = np.zeros((4, 2))  # [position, velocity] of every coordinate
+        self.p = np.zeros((4, 2, 2))  # covariance of every coordinate
+
+    def _propagate(self, dt):
+        """
+        propagates state and covariance by a time step
+        :param dt: time step in seconds
+        :return: double array[[]]: x,
+                 double array[[[]]]: p
+                 propagated state and covariance
+        """
+        f = np.array([[1, dt], [0, 1]])
+        q = self.q[:, None, None] * np.array([[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]])
+        x = self.x @ f.T
+        p = f @ self.p @ f.T + q
+        return x, p
+
+    def update(self, measurement, timestamp):
+        if self.count == 0:
+            self.x[:, 0] = measurement
+            self.x[:, 1] = 0
+            self.p[:] = 0
+            self.p[:, 0, 0] = self.r
+            self.p[:, 1, 1] = self.initial_velocity_variance
+            return
+
+        x, p = self._propagate(max(timestamp - self.timestamp, 0))
+
+        # measurement of the position --> H = [1, 0]
+        residual = measurement - x[:, 0]
+        residual[3] = wrap_angle(residual[3])
+        s = p[:, 0, 0] + self.r
+        k = p[:, :, 0] / s[:, None]
+        self.x = x + k * residual[:, None]
+        self.x[3, 0] = wrap_angle(self.x[3, 0])
+        self.p = p - k[:, :, None] * p[:, None, 0, :]
+
+    def predict(self, timestamp):
+        state = self.x[:, 0] + self.x[:, 1] * (timestamp - self.timestamp)
+        state[3] = wrap_angle(state[3])
+        return state
+
+    def clear(self):
+        self.x[:] = 0
+        self.p[:] = 0
+
+
+# available estimators for create_estimator()
+ESTIMATORS = ('moving-average', 'alpha-beta', 'kalman')
+
+
+def create_estimator(name, window_size=7, record=False):
+    """
+    creates a state estimator with its default parameters
+    :param name: name of the estimator, see ESTIMATORS
+    :param window_size: window size of the moving average estimator
+    :param record: if True, all appended poses are kept
+    :return: StateEstimator: estimator
+    """
+    if name == 'moving-average':
+        return MovingAverageEstimator(window_size, record=record)
+    if name == 'alpha-beta':
+        return AlphaBetaFilter(record=record)
+    if name == 'kalman':
+        return ConstantVelocityKalmanFilter(record=record)
+    raise ValueError("unknown estimator: " + str(name))
@@ -0,0 +1,200 @@
+"""
+Created on 18.10.2026
+
+@author: Florian Huber
+"""
+
+import threading
+import time
+import numpy as np
+
+from cflib.crazyflie.log import LogConfig
+
+# logged variables of the stabilizer log block
+LOG_VARIABLES = ('pm.vbat', 'stabilizer.yaw', 'stabilizer.pitch', 'stabilizer.roll')
+
+
+def wrap_angle(angle):
+    """
+    wraps an angle to [-180, 180) degrees
+    :param angle: angle in degrees (scalar or array)
+    :return: double: angle
+             wrapped angle
+    """
+    return (angle + 180) % 360 - 180
+
+
+class TelemetryHistory:
+    """
+    class for a fixed-size history of telemetry samples
+
+    The samples (timestamp, v_bat, yaw, pitch, roll) are stored in a preallocated ring buffer.
+    Since the samples arrive in time order, the older part [head:] and the newer part [:head]
+    of the buffer are both sorted, so a sample is found by binary search in O(log n).
+    """
+
+    def __init__(self, size=4096):
+        """
+        constructor for a telemetry history
+        :param size: number of samples that are kept (4096 samples ~ 49s at a logging period of 12ms)
+        """
+        self.size = size
+        self._data = np.zeros((size, 5))
+        self._head = 0  # index of the next sample
+        self._count = 0  # number of stored samples
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        :return: int: number of stored samples
+        """
+        return self._count
+
+    def append(self, sample):
+        """
+        stores a telemetry sample, the oldest sample is overwritten if the history is full
+        :param sample: (timestamp, v_bat, yaw, pitch, roll), timestamps must be increasing
+        :return: -
+        """
+        with self._lock:
+            self._data[self._head] = sample
+            self._head = (self._head + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+    def samples(self):
+        """
+        returns all stored samples in time order
+        :return: double array[[]]: samples
+                 N x 5 array, columns: timestamp, v_bat, yaw, pitch, roll
+        """
+        with self._lock:
+            if self._count < self.size:
+                return self._data[:self._count].copy()
+            return np.concatenate((self._data[self._head:], self._data[:self._head]))
+
+    def _neighbours(self, timestamp):
+        """
+        finds the samples before and after a timestamp, must be called with the lock held
+        :param timestamp: time of interest
+        :return: double array[]: before,
+                 double array[]: after
+                 the last sample at or before and the first sample after the timestamp (None if not available)
+        """
+        if self._count < self.size:
+            segments = (self._data[:self._count],)
+        else:
+            segments = (self._data[self._head:], self._data[:self._head])
+
+        before = None
+        for segment in segments:
+            if len(segment) == 0:
+                continue
+            index = np.searchsorted(segment[:, 0], timestamp, side='right')
+            if index > 0:
+                before = segment[index - 1]
+            if index < len(segment):
+                return before, segment[index]
+        return before, None
+
+    def at(self, timestamp):
+        """
+        returns the telemetry at a timestamp, linearly interpolated between the neighbouring samples
+        (yaw, pitch and roll are interpolated over the shorter way around the circle)
+        :param timestamp: time of interest (time.time(), e.g., receive timestamp of a frame)
+        :return: double array[]: sample
+                 [timestamp, v_bat, yaw, pitch, roll], the newest sample if the timestamp is newer than
+                 all samples, None if the timestamp is older than all samples
+        """
+        with self._lock:
+            before, after = self._neighbours(timestamp)
+            if before is None:
+                return None
+            if after is None:
+                return before.copy()
+
+            ratio = (timestamp - before[0]) / (after[0] - before[0])
+            sample = before + ratio * (after - before)
+            sample[2:] = wrap_angle(before[2:] + ratio * wrap_angle(after[2:] - before[2:]))
+            return sample
+
+
+class TelemetrySubscriber:
+    """
+    class for streaming the telemetry of the crazyflie
+
+    A single log block is registered for the lifetime of the connection. Its callback replaces
+    the snapshot (timestamp, v_bat, yaw, pitch, roll) with a new tuple; replacing the reference
+    is atomic, so reading the latest values needs no lock and no radio round trip.
+    """
+
+    def __init__(self, scf, period_in_ms=12, recorder=None, history=None):
+        """
+        constructor for a telemetry subscriber
+        :param scf: id of SyncCrazyflie
+        :param period_in_ms: logging period of the crazyflie
+        :param recorder: optional flight_log.FlightRecorder, receives every telemetry sample
+        :param history: optional TelemetryHistory, stores every telemetry sample
+        """
+        self.scf = scf
+        self.recorder = recorder
+        self.history = history
+        self.samples = 0  # number of received samples
+
+        self.log_config = LogConfig(name="Stabilizer", period_in_ms=period_in_ms)
+        for name in LOG_VARIABLES:
+            self.log_config.add_variable(name, 'float')
+
+        self._snapshot = None
+        self._first_sample = threading.Event()
+
+    def start(self):
+        """
+        registers the log block at the crazyflie and starts logging
+        :return: -
+        """
+        self.scf.cf.log.add_config(self.log_config)
+        self.log_config.data_received_cb.add_callback(self._log_data)
+        self.log_config.start()
+
+    def stop(self):
+        """
+        stops logging
+        :return: -
+        """
+        self.log_config.stop()
+        self.log_config.data_received_cb.remove_callback(self._log_data)
+
+    def wait_for_sample(self, timeout=None):
+        """
+        blocks until the first sample is received
+        :param timeout: maximum time in seconds to wait
+        :return: boolean: received
+                 True if a sample is available
+        """
+        return self._first_sample.wait(timeout)
+
+    def snapshot(self):
+        """
+        returns the latest telemetry sample
+        :return: tuple: sample
+                 (timestamp, v_bat, yaw, pitch, roll), None if no sample was received yet
+        """
+        return self._snapshot
+
+    def _log_data(self, timestamp, data, log_config):
+        """
+        callback of the log block, stores the received sample
+        :param timestamp: timestamp of the crazyflie in ms
+        :param data: dict with the logged variables
+        :param log_config: log block of the sample
+        :return: -
+        """
+        sample = (time.time(), data['pm.vbat'], data['stabilizer.yaw'], data['stabilizer.pitch'],
+                  data['stabilizer.roll'])
+        self._snapshot = sample
+        self.samples += 1
+        self._first_sample.set()
+        if self.history is not None:
+            self.history.append(sample)
+        if self.recorder is not None:
+            self.recorder.record_telemetry(*sample[1:], timestamp=sample[0])